@@ -0,0 +1,104 @@
+from __future__ import annotations
+from typing import Dict,Tuple,Union,Callable
+import pandas as pd
+import numpy as np
+
+from TreeIO import deserialize_tree
+from DataStructures.CompiledTree import CompiledTree
+from Decision import decision_dtype
+from RawIndicators.GenerateDecisions import decision_rules
+from Indicators.IndicatorRegistry import threshold_parameters
+from RawIndicators.SeriesCache import SeriesCache
+
+
+def parameter_key(name:str,parameters:Dict)->Tuple:
+    """Hashable key of an indicator and its parameters."""
+    return (name,tuple(sorted(parameters.items())))
+
+
+def split_parameters(parameters:Dict)->Tuple[Dict,Dict]:
+    """Splits node parameters into those of the series and the thresholds
+    its decision rule takes."""
+    series_parameters = {k:v for k,v in parameters.items()
+                         if k not in threshold_parameters}
+    rule_parameters = {k:v for k,v in parameters.items()
+                       if k in threshold_parameters}
+    return series_parameters,rule_parameters
+
+
+def node_decision_codes(tree:CompiledTree,
+                        candles:pd.DataFrame,
+                        rules:Dict[str,Tuple[Callable,Callable]]=decision_rules,
+                        cache:SeriesCache=None)->np.ndarray:
+    """Computes the decision of every node for every candle in one pass over
+    the history per distinct indicator series. Nodes which only differ in
+    their thresholds share the series and just apply their own rule to it.
+    Parameters:
+        tree (CompiledTree): The tree whose nodes to compute.
+        candles (pd.DataFrame): The full candle history.
+        rules (Dict): Series function and decision rule per indicator name.
+        cache (SeriesCache): Where to look up series computed before.
+    Returns the Decision codes as an array of shape (nodes,candles)."""
+    codes = np.empty((tree.node_count(),candles.shape[0]),dtype=decision_dtype)
+    series = {}
+    decided = {}
+    for index,(name,parameters) in enumerate(zip(tree.names,tree.parameters)):
+        key = parameter_key(name,parameters)
+        if key not in decided:
+            series_function,rule = rules[name]
+            series_parameters,rule_parameters = split_parameters(parameters)
+
+            series_key = parameter_key(name,series_parameters)
+            if series_key not in series:
+                if cache is None:
+                    series[series_key] = series_function(candles,
+                                                         **series_parameters)
+                else:
+                    series[series_key] = cache.call(series_function,
+                                                    candles,
+                                                    **series_parameters)
+            decided[key] = rule(series[series_key],**rule_parameters)
+        codes[index] = decided[key]
+    return codes
+
+
+def resolve_tree(tree:CompiledTree,codes:np.ndarray)->np.ndarray:
+    """Walks every candle down the tree at once. Each pass moves all candles
+    which still sit on a node one level down along the branch their node
+    decided, so the loop runs once per level rather than once per candle.
+    Parameters:
+        tree (CompiledTree): The tree to resolve.
+        codes (np.ndarray): The node decision codes from node_decision_codes.
+    Returns the terminal Decision code for every candle."""
+    size = codes.shape[1]
+    current = np.full(size,tree.root,dtype=np.int32)
+    active = np.flatnonzero(current >= 0)
+    while active.shape[0]:
+        nodes = current[active]
+        current[active] = tree.children[nodes,codes[nodes,active]]
+        active = active[current[active] >= 0]
+
+    return tree.labels[-current-1]
+
+
+def backtest_tree(tree:Union[str,CompiledTree],
+                  candles:pd.DataFrame,
+                  cache:SeriesCache=None)->np.ndarray:
+    """Computes the decisions a tree makes over a whole candle history using
+    the batch RawIndicators rather than replaying candles one at a time.
+    Nodes decide by the GenerateDecisions rules, which decide as the live
+    indicators do, so with a candle store holding the whole history the
+    decisions equal those of the live tree. The live trader only keeps a
+    short candle buffer though, and a stochastic node whose period is longer
+    than the buffer never has enough candles to decide live and always
+    holds, while here it decides on the full history. test.py
+    test_backtest_matches_live checks the two agree.
+    Parameters:
+        tree (Union[str,CompiledTree]): A compiled tree or its serialized json.
+        candles (pd.DataFrame): Candles as built by candles_from_ticker.
+        cache (SeriesCache): Where to look up series computed before.
+    Returns the Decision code for every candle, see Decision.save_decisions
+    to keep them as a memory mappable file."""
+    if isinstance(tree,str):
+        tree = deserialize_tree(tree,compiled=True)
+    return resolve_tree(tree,node_decision_codes(tree,candles,cache=cache))
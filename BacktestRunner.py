@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import List,Dict,Iterator,Tuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import json
+import pandas as pd
+import numpy as np
+
+from Backtest import backtest_tree
+from Candle import candles_from_ticker
+from DataStructures.CompiledTree import CompiledTree
+from Decision import Decision
+from Population import (simulate_trades,candle_bids,candle_columns,
+                        fitness_columns)
+from RawIndicators.SeriesCache import SeriesCache
+from SharedArrays import SharedArrays,attach_arrays
+
+runner_ticker_columns = ["best_bid","best_ask","total_traded_asset"]
+
+# Shared arrays and parsed trees of this process.
+_worker = {}
+
+
+def backtest_items(tree_files:List[str],
+                   candle_periods:List[int],
+                   commissions:List[float])->List[Tuple]:
+    """Every combination of tree file, candle period and commission, in the
+    order results are returned."""
+    return list(product(tree_files,candle_periods,commissions))
+
+
+def _initialize_worker(ticker_descriptor:Dict,
+                       candle_descriptors:Dict,
+                       cache_directory:str=None):
+    _worker["ticker"] = attach_arrays(ticker_descriptor)
+    _worker["candles"] = {
+        period:pd.DataFrame(attach_arrays(descriptor),copy=False)
+        for period,descriptor in candle_descriptors.items()}
+    _worker["trees"] = {}
+    _worker["cache"] = SeriesCache(cache_directory)
+
+
+def _tree(tree_file:str)->CompiledTree:
+    """Parses each tree file once per process."""
+    trees = _worker["trees"]
+    if tree_file not in trees:
+        with open(tree_file) as file:
+            trees[tree_file] = CompiledTree.from_dict(json.load(file))
+    return trees[tree_file]
+
+
+def _backtest_task(task:Tuple)->Dict:
+    """Backtests one tree on the candles of one period at one commission.
+    Buys happen at the candle close, which is the best ask, and sells at the
+    best bid of the candle's last tick."""
+    (tree_file,period,commission),warmup,starting_balance = task
+    candles = _worker["candles"][period]
+    decisions = backtest_tree(_tree(tree_file),candles,cache=_worker["cache"])
+    decisions[:warmup] = Decision.HOLD
+
+    bids = candle_bids(candles,_worker["ticker"])
+
+    result = {"tree":tree_file,"candle_period":period,"commission":commission}
+    result.update(simulate_trades(decisions,
+                                  candles["close"].to_numpy(),
+                                  bids,
+                                  starting_balance=starting_balance,
+                                  commission=commission))
+    return result
+
+
+def run_backtests(tree_files:List[str],
+                  ticker:Dict[str,np.ndarray],
+                  candle_periods:List[int]=(30,),
+                  commissions:List[float]=(0.01,),
+                  processes:int=None,
+                  warmup:int=0,
+                  starting_balance:float=100.0,
+                  chunk_size:int=1,
+                  cache_directory:str=None)->Iterator[Dict]:
+    """Backtests every tree file at every candle period and commission over
+    one ticker history on a process pool. The ticker and the candles of each
+    period are put in shared memory once and workers attach to them, so no
+    work item rebuilds candles or receives a copy of them. Results are
+    yielded as they become available, in the order of backtest_items.
+    Parameters:
+        tree_files (List[str]): Serialized tree files.
+        ticker (Dict[str,np.ndarray]): Ticker columns, e.g. from load_ticker.
+        candle_periods (List[int]): Candle lengths in ticks.
+        commissions (List[float]): The fraction of every trade lost to fees.
+        processes (int): Worker processes, None uses one per cpu.
+        warmup (int): Candles at the start on which no trades are made.
+        starting_balance (float): The balance every run trades with.
+        chunk_size (int): Work items sent to a worker at a time.
+        cache_directory (str): Directory of the indicator series cache
+            shared by the workers, None keeps series in memory only.
+    Yields a dict of the tree, candle period, commission and fitness_columns
+    for every work item."""
+    items = backtest_items(tree_files,candle_periods,commissions)
+    tasks = ((item,warmup,starting_balance) for item in items)
+
+    shared = []
+    try:
+        shared_ticker = SharedArrays(
+            {c:np.asarray(ticker[c],dtype=np.float64)
+             for c in runner_ticker_columns})
+        shared.append(shared_ticker)
+
+        candle_descriptors = {}
+        for period in dict.fromkeys(candle_periods):
+            candles = candles_from_ticker(ticker,period=period)
+            columns = {c:candles[c].to_numpy() for c in candle_columns}
+            columns["index"] = candles["index"].to_numpy()
+            columns["elements"] = candles["elements"].to_numpy()
+            shared_candles = SharedArrays(columns)
+            shared.append(shared_candles)
+            candle_descriptors[period] = shared_candles.descriptor()
+
+        with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_initialize_worker,
+                initargs=(shared_ticker.descriptor(),
+                          candle_descriptors,
+                          cache_directory)) as pool:
+            yield from pool.map(_backtest_task,tasks,chunksize=chunk_size)
+    finally:
+        for segments in shared:
+            segments.close()
+
+
+def backtest_table(tree_files:List[str],
+                   ticker:Dict[str,np.ndarray],
+                   **kwargs)->pd.DataFrame:
+    """Collects run_backtests into a dataframe with a row per work item."""
+    columns = ["tree","candle_period","commission"] + fitness_columns
+    return pd.DataFrame(list(run_backtests(tree_files,ticker,**kwargs)),
+                        columns=columns)
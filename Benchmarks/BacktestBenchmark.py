@@ -0,0 +1,38 @@
+"""Times the batch backtester on a serialized tree over growing candle
+histories, next to the time taken by the distinct indicator series alone.
+Run from the repository root with python -m Benchmarks.BacktestBenchmark"""
+from time import perf_counter
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+from Backtest import backtest_tree,node_decision_codes,resolve_tree
+from TreeIO import deserialize_tree
+from Benchmarks.RawIndicatorBenchmark import random_candles
+
+
+def main(tree_file:str="SerializedTrees/popfile-0.json",
+         sizes=(100_000,250_000,525_600,1_000_000)):
+    with open(tree_file) as file:
+        tree = deserialize_tree(file.read(),compiled=True)
+
+    print(F"{'candles':>10}{'series':>12}{'resolve':>12}{'total':>12}")
+    for size in sizes:
+        candles = random_candles(size)
+        start = perf_counter()
+        codes = node_decision_codes(tree,candles)
+        series = perf_counter() - start
+
+        start = perf_counter()
+        resolve_tree(tree,codes)
+        resolve = perf_counter() - start
+
+        start = perf_counter()
+        backtest_tree(tree,candles)
+        total = perf_counter() - start
+        print(F"{size:>10}{series:>12.4f}{resolve:>12.4f}{total:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
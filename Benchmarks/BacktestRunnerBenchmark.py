@@ -0,0 +1,44 @@
+"""Measures backtest throughput of the process pool runner against the number
+of workers. Items per second should grow linearly with the workers up to the
+number of cores. Run from the repository root with
+python -m Benchmarks.BacktestRunnerBenchmark"""
+from time import perf_counter
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+from BacktestRunner import run_backtests
+
+
+def random_ticker(size:int,seed:int=0):
+    """Random walk ticker which is good enough for timing."""
+    rng = np.random.default_rng(seed)
+    asks = 30000 + np.cumsum(rng.normal(0,1,size))
+    return {"best_ask":asks,
+            "best_bid":asks - rng.uniform(0,0.5,size),
+            "total_traded_asset":1e6 + np.cumsum(rng.uniform(0,1,size))}
+
+
+def main(tree_file:str="SerializedTrees/popfile-0.json",
+         ticks:int=3_000_000,
+         items:int=64):
+    ticker = random_ticker(ticks)
+    commissions = np.linspace(0.0,0.01,items).tolist()
+    cores = os.cpu_count()
+    workers = sorted({1,2,4,8,16,32,cores}.intersection(range(1,cores+1)))
+
+    print(F"{'workers':>8}{'seconds':>12}{'items/s':>12}")
+    for count in workers:
+        start = perf_counter()
+        for _ in run_backtests([tree_file],ticker,
+                               candle_periods=[30],
+                               commissions=commissions,
+                               processes=count):
+            pass
+        elapsed = perf_counter() - start
+        print(F"{count:>8}{elapsed:>12.3f}{items/elapsed:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
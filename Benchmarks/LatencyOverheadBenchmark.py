@@ -0,0 +1,38 @@
+"""Measures what the latency instrumentation of Trader costs per tick: the
+timestamp taken on receive and the frame_wait, decode and candle_update
+stages recorded on every tick. Run from the repository root with
+python -m Benchmarks.LatencyOverheadBenchmark"""
+from time import perf_counter_ns
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+from Latency import LatencyRecorder
+
+
+def instrumented_ticks(ticks:int)->int:
+    latency = LatencyRecorder(["frame_wait","decode","candle_update"])
+    start = perf_counter_ns()
+    for _ in range(ticks):
+        received = perf_counter_ns()
+        decoding = latency.since("frame_wait",received)
+        latency.since("decode",decoding)
+        latency.since("candle_update",perf_counter_ns())
+    return perf_counter_ns() - start
+
+
+def bare_ticks(ticks:int)->int:
+    start = perf_counter_ns()
+    for _ in range(ticks):
+        pass
+    return perf_counter_ns() - start
+
+
+def main(ticks:int=200_000,repeats:int=5):
+    instrumented = min(instrumented_ticks(ticks) for _ in range(repeats))
+    bare = min(bare_ticks(ticks) for _ in range(repeats))
+    print(F"Instrumentation overhead: {(instrumented-bare)/ticks:.0f} ns/tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Times the recursive RawIndicators over growing candle histories. Every
+function should scale linearly, so the time per candle column should stay
+flat as the number of candles doubles. Run from the repository root with
+python -m Benchmarks.RawIndicatorBenchmark"""
+from typing import Callable,Dict
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+from RawIndicators.RawIndicators import (
+    exponential_moving_average,
+    kaufman_adaptive_moving_average,
+    relative_strength_index,
+    average_true_range,
+    ulcer_index,
+    stochastic_oscillator)
+
+benchmarks = {
+    "ema": lambda c: exponential_moving_average(c["close"].values,18),
+    "kama": lambda c: kaufman_adaptive_moving_average(c["close"].values,10,2,30),
+    "rsi": lambda c: relative_strength_index(c,18),
+    "atr": lambda c: average_true_range(c,14),
+    "ulcer": lambda c: ulcer_index(c,14),
+    "stochastic": lambda c: stochastic_oscillator(c,93,3),
+}
+
+
+def random_candles(size:int,seed:int=0)->pd.DataFrame:
+    """Random walk candles which are good enough for timing."""
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0,5,size))
+    candles = pd.DataFrame()
+    candles["open"] = np.roll(close,1)
+    candles["close"] = close
+    candles["high"] = np.maximum(candles["open"],close) + rng.uniform(0,3,size)
+    candles["low"] = np.minimum(candles["open"],close) - rng.uniform(0,3,size)
+    candles["volume"] = rng.uniform(1,100,size)
+    return candles
+
+
+def time_call(function:Callable,candles:pd.DataFrame,repeats:int=3)->float:
+    """Best of repeats wall time in seconds."""
+    best = np.inf
+    for _ in range(repeats):
+        start = perf_counter()
+        function(candles)
+        best = min(best,perf_counter()-start)
+    return best
+
+
+def main(sizes=(25_000,50_000,100_000,200_000,400_000)):
+    print(F"{'indicator':<12}{'candles':>10}{'seconds':>12}{'ns/candle':>12}")
+    for name,function in benchmarks.items():
+        for size in sizes:
+            elapsed = time_call(function,random_candles(size))
+            print(F"{name:<12}{size:>10}{elapsed:>12.4f}"\
+                  F"{elapsed/size*1e9:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Runs the trader end to end against a local replay of a recorded stream as
+fast as it can read, and reports its throughput and pipeline metrics. Uses
+the given recording, or records generated frames first. Run from the
+repository root with python -m Benchmarks.ReplayBenchmark [recording]"""
+from time import perf_counter
+import asyncio
+import os
+import sys
+import tempfile
+import websockets
+sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+import Trader
+from StreamReplay import StreamRecorder,replay_handler
+from Benchmarks.TickerDecodeBenchmark import random_frames
+
+
+def generated_recording(path:str,size:int=30_000):
+    with StreamRecorder(path) as recorder:
+        for i,frame in enumerate(random_frames(size)):
+            recorder.record(frame,timestamp=i*1_000_000_000)
+
+
+async def replay(path:str,speed:float=0,port:int=8766)->float:
+    async with websockets.serve(replay_handler(path,speed),"localhost",port):
+        async with websockets.connect(F"ws://localhost:{port}",
+                                      ping_interval=None) as ws:
+            await ws.send('{"method":"SUBSCRIBE","id":1}')
+            await ws.recv()
+
+            start = perf_counter()
+            try:
+                await Trader.trader(ws,["btcusdt"])
+            except websockets.ConnectionClosed:
+                pass
+            return perf_counter() - start
+
+
+def main(recording:str=None):
+    with tempfile.TemporaryDirectory() as directory:
+        if recording is None:
+            recording = os.path.join(directory,"generated.log.gz")
+            generated_recording(recording)
+
+        with open(os.devnull,"w") as devnull:
+            stdout,sys.stdout = sys.stdout,devnull
+            try:
+                elapsed = asyncio.run(replay(recording))
+            finally:
+                sys.stdout = stdout
+
+    metrics = Trader.pipeline.metrics()
+    frames = metrics["parser"]["taken"]
+    print(F"{frames} frames in {elapsed:.3f}s, {frames/elapsed:.0f} frames/s")
+    for name,stage in metrics.items():
+        print(F"{name:>24} {stage}")
+    print(Trader.latency.dump())
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
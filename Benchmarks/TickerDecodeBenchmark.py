@@ -0,0 +1,78 @@
+"""Measures the per message cost of decoding combined stream @ticker frames,
+comparing the old json.loads and dict path with every available backend of
+TickerDecoding. Frames are read from a file with one raw frame per line when
+one is given, otherwise realistic frames are generated. Run from the
+repository root with python -m Benchmarks.TickerDecodeBenchmark [frames]"""
+from time import perf_counter_ns
+import json
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+from TickerDecoding import ticker_decoders
+
+ticker_mapping = {"b":"best_bid","a":"best_ask","w":"total_traded_asset"}
+
+
+def random_frames(size:int,seed:int=0)->list:
+    """Frames with every field of a Binance 24hr ticker event."""
+    rng = np.random.default_rng(seed)
+    asks = 30000 + np.cumsum(rng.normal(0,1,size))
+    frames = []
+    for i,ask in enumerate(asks):
+        data = {"e":"24hrTicker","E":1609459200000+i*1000,"s":"BTCUSDT",
+                "p":"-412.10000000","P":"-1.347","w":F"{ask+12.3:.8f}",
+                "x":F"{ask-1:.8f}","c":F"{ask:.8f}","Q":"0.00132000",
+                "b":F"{ask-0.01:.8f}","B":"0.81023000","a":F"{ask:.8f}",
+                "A":"0.30045000","o":"30520.01000000","h":"31012.00000000",
+                "l":"29874.11000000","v":"50211.12345600",
+                "q":"1523012345.12345678","O":1609372800000,"C":1609459200000,
+                "F":512345678,"L":513345678,"n":1000001}
+        frames.append(json.dumps({"stream":"btcusdt@ticker","data":data},
+                                 separators=(",",":")))
+    return frames
+
+
+def dict_path(frame:str):
+    """The decoding Trader did before TickerDecoding, including the float
+    conversions update_current_candle made on every tick."""
+    data = json.loads(frame)
+    row = {v:data["data"][k] for k,v in ticker_mapping.items()}
+    for name in ("total_traded_asset","total_traded_asset","best_ask",
+                 "best_ask","best_ask","best_ask"):
+        float(row[name])
+    return row
+
+
+def time_decoder(decode,frames:list,repeats:int=5)->float:
+    """Best nanoseconds per message over a number of passes."""
+    best = None
+    for _ in range(repeats):
+        start = perf_counter_ns()
+        for frame in frames:
+            decode(frame)
+        elapsed = (perf_counter_ns() - start) / len(frames)
+        best = elapsed if best is None else min(best,elapsed)
+    return best
+
+
+def main(payload_file:str=None,messages:int=100_000):
+    if payload_file:
+        with open(payload_file) as file:
+            frames = [line.rstrip("\n") for line in file if line.strip()]
+    else:
+        frames = random_frames(messages)
+
+    decoders = {"json+dict":dict_path}
+    decoders.update(ticker_decoders)
+    baseline = None
+    print(F"{'decoder':>10}{'ns/msg':>10}{'speedup':>10}")
+    for name,decode in decoders.items():
+        cost = time_decoder(decode,frames)
+        baseline = baseline or cost
+        print(F"{name:>10}{cost:>10.0f}{baseline/cost:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import Dict
+from typing import Dict,Any
+import pandas as pd
 import numpy as np
 
+from DataBuffer import DataBuffer,open_buffer_file
+
 def new_candle()->Dict:
     """Returns a totally new reset candle with no information filled in yet."""
     return {"open":None,
@@ -19,28 +22,230 @@ def update_current_candle(state,
     pushed and a new clean candle is generated. Note we use the best ask price
     in every situation.
     Returns whether the candle has been completed and a new one is needed."""
+    ask = float(new_data["best_ask"])
+    traded = float(new_data["total_traded_asset"])
+
     live_volume = 0.0
     if state.prev_volume == 0.0:
-        state.prev_volume = float(new_data["total_traded_asset"])
+        state.prev_volume = traded
     else:
-        live_volume = float(new_data["total_traded_asset"]) - state.prev_volume
-        state.prev_volume = float(new_data["total_traded_asset"])
+        live_volume = traded - state.prev_volume
+        state.prev_volume = traded
 
     state.running_volume += live_volume
 
     if state.current_candle["open"] is None:
-        state.current_candle["open"] = float(new_data["best_ask"])
+        state.current_candle["open"] = ask
 
-    if state.current_candle["high"] < float(new_data["best_ask"]):
-        state.current_candle["high"] = float(new_data["best_ask"])
+    if state.current_candle["high"] < ask:
+        state.current_candle["high"] = ask
 
-    if state.current_candle["low"] > float(new_data["best_ask"]):
-        state.current_candle["low"] = float(new_data["best_ask"])
+    if state.current_candle["low"] > ask:
+        state.current_candle["low"] = ask
 
     state.current_candle["volume"] += state.running_volume
-    state.current_candle["close"] = float(new_data["best_ask"])
+    state.current_candle["close"] = ask
     state.current_candle["elements"] += 1
 
     if state.current_candle["elements"] == state.candle_period:
         return True
-    return False
\ No newline at end of file
+    return False
+
+candle_fields = ["open","high","low","close","volume","elements"]
+
+
+class CandleStore:
+    def __init__(self,max_size:int,filename:str=None):
+        """Rolling store of completed candles kept as one float64 column per
+        candle field instead of a list of dicts. Each column is a ring buffer
+        holding the latest max_size candles, so pushing a candle is a single
+        write per column and the accessors hand out read only views.
+        Parameters:
+            max_size (int): The number of candles retained.
+            filename (str): Optionally also write every candle to this csv
+                file in the buffers/ folder."""
+        self._max_size = max_size
+        self._columns = {f:DataBuffer(max_size=max_size,dtype=np.float64)
+                         for f in candle_fields}
+        self._pushed = 0
+
+        self._writer = None
+        if filename:
+            self._writer = open_buffer_file(filename,candle_fields)
+
+
+    def push(self,candle:Dict):
+        """Append a completed candle, dropping the oldest once full."""
+        for name,column in self._columns.items():
+            column.push(candle[name])
+        self._pushed += 1
+
+        if self._writer:
+            self._writer.write([candle[f] for f in candle_fields])
+
+
+    def column(self,name:str,n:int=None)->np.ndarray:
+        """Returns a read only view over the latest n values of a field, oldest
+        first. All stored values are returned if n is not given."""
+        return self._columns[name].window(n)
+
+
+    def opens(self,n:int=None)->np.ndarray:
+        return self._columns["open"].window(n)
+
+
+    def highs(self,n:int=None)->np.ndarray:
+        return self._columns["high"].window(n)
+
+
+    def lows(self,n:int=None)->np.ndarray:
+        return self._columns["low"].window(n)
+
+
+    def closes(self,n:int=None)->np.ndarray:
+        return self._columns["close"].window(n)
+
+
+    def volumes(self,n:int=None)->np.ndarray:
+        return self._columns["volume"].window(n)
+
+
+    def elements(self,n:int=None)->np.ndarray:
+        return self._columns["elements"].window(n)
+
+
+    def latest(self,name:str)->float:
+        """Returns the named field of the most recent candle."""
+        return self._columns[name].get(-1)
+
+
+    def pushed(self)->int:
+        """Returns the number of candles pushed over the store's lifetime."""
+        return self._pushed
+
+
+    def as_of(self,lag:int)->CandleView:
+        """Returns the store as it looked lag candles ago. lag must be lower
+        than the number of candles currently held."""
+        return CandleView(self,lag)
+
+
+    def capacity(self)->int:
+        return self._max_size
+
+
+    def current_size(self)->int:
+        return self._columns["close"].current_size()
+
+
+    def is_full(self)->bool:
+        return self._columns["close"].is_full()
+
+
+    def __len__(self)->int:
+        return self.current_size()
+
+
+    def __getitem__(self,name:str)->np.ndarray:
+        """Column access so the store can stand in for a candle dataframe."""
+        return self.column(name)
+
+
+class CandleView:
+    def __init__(self,store:CandleStore,lag:int):
+        """Read only view of a candle store lag candles in the past, used to
+        replay candles an indicator skipped. The view holds no copies, so it
+        is only valid until the next candle is pushed. Windows can only reach
+        back as far as the candles the store still holds.
+        Parameters:
+            store (CandleStore): The store to look into.
+            lag (int): How many of the latest candles to hide."""
+        self._store = store
+        self._lag = lag
+
+
+    def column(self,name:str,n:int=None)->np.ndarray:
+        """Returns the latest n values of a field as of the view, oldest
+        first."""
+        window = self._store.column(name)[:self._store.current_size()-self._lag]
+        if n is None or n > window.shape[0]:
+            return window
+        return window[window.shape[0]-n:]
+
+
+    def latest(self,name:str)->float:
+        return self._store._columns[name].get(-1-self._lag)
+
+
+    def pushed(self)->int:
+        return self._store.pushed() - self._lag
+
+
+    def current_size(self)->int:
+        return min(self.pushed(),self._store.capacity())
+
+
+    def __len__(self)->int:
+        return self.current_size()
+
+
+def candle_bounds(size:int,period:int,timestamps:np.array=None)->np.array:
+    """Returns the row index at which each complete candle opens, followed by
+    the row index one past the last complete candle. Candles either span
+    period rows, or when timestamps (in seconds) are given, every tick whose
+    time falls in the same period second bucket. A trailing candle is always
+    dropped if it is partial: by row count when it has fewer than period
+    rows, and by time for the bucket holding the last tick since more ticks
+    could still arrive for it."""
+    if timestamps is None:
+        complete = size // period
+        return np.arange(0,(complete*period)+1,period)
+
+    buckets = np.floor_divide(np.asarray(timestamps,dtype=np.float64),period)
+    changes = np.flatnonzero(np.diff(buckets)) + 1
+    return np.concatenate(([0],changes)) if changes.shape[0] else np.zeros(1,int)
+
+
+def candles_from_ticker(ticker:Any,
+                        period:int=30,
+                        timestamps:np.array=None,
+                        seed_volume:float=100000.0)->pd.DataFrame:
+    """Builds candles from raw ticker data in one pass using ufunc reduceat
+    over the candle boundaries instead of slicing each candle. Prices used are
+    the best asks. Volumes follow update_current_candle: the 24 hour traded
+    volume is diffed tick to tick and accumulated on top of seed_volume, and
+    each candle sums that running volume over its ticks.
+    Parameters:
+        ticker (Any): A dataframe or dict of arrays holding the best_ask and
+            total_traded_asset columns.
+        period (int): The candle length in rows, or in seconds if timestamps
+            are given.
+        timestamps (np.array): Optional tick times in seconds for time based
+            candles.
+    Returns a dataframe with index, open, close, low, high, volume and
+    elements columns, one row per complete candle."""
+    prices = np.asarray(ticker["best_ask"],dtype=np.float64)
+    traded = np.asarray(ticker["total_traded_asset"],dtype=np.float64)
+
+    bounds = candle_bounds(prices.shape[0],period,timestamps)
+    open_idx = bounds[:-1]
+    end = bounds[-1]
+
+    candles = pd.DataFrame()
+    candles["index"] = np.array(open_idx,dtype=np.intc)
+    if open_idx.shape[0] == 0:
+        for column in ["open","close","low","high","volume"]:
+            candles[column] = np.empty(0,dtype=np.float64)
+        candles["elements"] = np.empty(0,dtype=np.intc)
+        return candles
+
+    running_volume = np.cumsum(np.insert(np.diff(traded[:end]),0,seed_volume))
+    prices = prices[:end]
+
+    candles["open"] = prices[open_idx]
+    candles["close"] = prices[bounds[1:]-1]
+    candles["low"] = np.minimum.reduceat(prices,open_idx)
+    candles["high"] = np.maximum.reduceat(prices,open_idx)
+    candles["volume"] = np.add.reduceat(running_volume,open_idx)
+    candles["elements"] = np.array(np.diff(bounds),dtype=np.intc)
+    return candles
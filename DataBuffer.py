@@ -1,82 +1,203 @@
 from __future__ import annotations
 from typing import List,Any,Dict
+from time import monotonic
+import numpy as np
+import atexit
 import os
 
+
+class BufferedWriter:
+	def __init__(self,
+				 filepath:str,
+				 header:List[str],
+				 max_lines:int=256,
+				 max_delay:float=5.0):
+		"""Keeps a csv file open and batches the rows written to it. Pending
+		rows are written out once max_lines have accumulated or max_delay
+		seconds have passed since the last flush, whichever comes first. The
+		writer is flushed and closed automatically on interpreter exit.
+		Parameters:
+			filepath (str): The file to create. Existing files are replaced.
+			header (List[str]): Column names written as the first line.
+			max_lines (int): Number of pending rows which triggers a flush.
+			max_delay (float): Seconds after which pending rows are flushed on
+				the next write."""
+		self._max_lines = max_lines
+		self._max_delay = max_delay
+		self._pending = []
+		self._last_flush = monotonic()
+
+		self._file = open(filepath,"w+")
+		self._file.write(','.join(header) + '\n')
+		atexit.register(self.close)
+
+
+	def write(self,value:Any):
+		"""Queue a single row for writing. Lists and dicts are written as one
+		comma separated row, anything else as a single column."""
+		if isinstance(value,List):
+			self._pending.append(','.join([str(v) for v in value]))
+		elif isinstance(value,Dict):
+			self._pending.append(','.join([str(v) for v in value.values()]))
+		else:
+			self._pending.append(str(value))
+
+		if len(self._pending) >= self._max_lines or\
+			monotonic() - self._last_flush >= self._max_delay:
+			self.flush()
+
+
+	def flush(self):
+		"""Write all pending rows to the file."""
+		if self._pending and not self._file.closed:
+			self._file.write('\n'.join(self._pending) + '\n')
+			self._file.flush()
+		self._pending = []
+		self._last_flush = monotonic()
+
+
+	def close(self):
+		if not self._file.closed:
+			self.flush()
+			self._file.close()
+
+
+def open_buffer_file(filename:str,header:List[str])->BufferedWriter:
+	"""Opens a buffered writer for filename in the buffers/ folder, creating
+	the folder if needed."""
+	if not os.path.exists(os.path.join(os.getcwd(),'buffers/')):
+		os.mkdir(os.path.join(os.getcwd(),'buffers/'))
+
+	filepath = os.path.join(os.getcwd(),'buffers/',filename)
+	return BufferedWriter(filepath,header)
+
+
+def _is_scalar(value:Any)->bool:
+	return isinstance(value,(int,float,np.number)) and not isinstance(value,bool)
+
+
 class DataBuffer:
-	def __init__(self,max_size:int,filename:str=None,header:List[str]=None):
-		"""Creates a databuffer. Optionally if filename and header are specified
-		then every time a value is pushed to the buffer it will be appended to
-		a file with the name specified in the buffers/ folder."""
+	def __init__(self,
+				 max_size:int,
+				 filename:str=None,
+				 header:List[str]=None,
+				 dtype:Any=None):
+		"""Creates a fixed capacity ring buffer. Scalar values are stored in a
+		preallocated float64 array, anything else in an object array. The
+		storage type is picked from the first value pushed unless dtype is
+		given. Optionally if filename and header are specified then every
+		value pushed to the buffer is also appended to a file with the name
+		specified in the buffers/ folder.
+
+		The ring is mirrored: every value is written both at its slot and one
+		capacity further along, so the latest n values are always contiguous
+		and can be handed out as a view without copying."""
 		self._buffer_size = max_size
-		self._buffer = []
-		
-		self._filepath = None
+		self._buffer = None
+		self._head = 0
+		self._size = 0
+		if dtype is not None:
+			self._buffer = np.empty(2*max_size,dtype=dtype)
+
+		self._writer = None
 		if filename and header:
-			if not os.path.exists(os.path.join(os.getcwd(),'buffers/')):
-				os.mkdir(os.path.join(os.getcwd(),'buffers/'))
+			self._writer = open_buffer_file(filename,header)
 
-			self._filepath = os.path.join(os.getcwd(),'buffers/',filename)
 
-			if os.path.exists(self._filepath):
-				os.remove(self._filepath)
-				
-			with open(self._filepath,"w+") as file:
-				file.write(','.join(header) + '\n')
+	def _allocate(self,value:Any):
+		"""Create the storage once the first value tells us what we hold, and
+		fall back to object storage if a non scalar shows up later."""
+		if self._buffer is None:
+			dtype = np.float64 if _is_scalar(value) else object
+			self._buffer = np.empty(2*self._buffer_size,dtype=dtype)
+		elif self._buffer.dtype != object and not _is_scalar(value):
+			self._buffer = self._buffer.astype(object)
 
 
 	def get(self,index:int)->Any:
 		"""Returns the value at the specified index without deleting. """
-		return self._buffer[index]
+		if index < 0:
+			index += self._size
+		if index < 0 or index >= self._size:
+			raise IndexError("DataBuffer index out of range")
+		return self._buffer[self._head + self._buffer_size - self._size + index]
+
+
+	def window(self,n:int=None)->np.ndarray:
+		"""Returns a read only view over the latest n values, oldest first. If
+		n is not given or exceeds the current size the whole buffer is used.
+		The view reflects later pushes, so copy it if it has to be kept."""
+		if self._buffer is None:
+			return np.empty(0)
+		if n is None or n > self._size:
+			n = self._size
+
+		end = self._head + self._buffer_size
+		view = self._buffer[end - n:end]
+		view.flags.writeable = False
+		return view
 
 
-	def get_all(self)->List[Any]:
+	def as_array(self)->np.ndarray:
+		"""Returns a read only view over the full buffer, oldest first."""
+		return self.window()
+
+
+	def get_all(self)->np.ndarray:
 		"""Returns the full buffer without flushing it."""
-		return self._buffer
-	
+		return self.window()
+
 
 	def push(self,value:Any):
-		"""Add a value to the buffer. Works in a FIFO basis, but deletes
-		elements exceeding buffer size."""
-		while len(self._buffer) >= self._buffer_size:
-			self._buffer.pop(0)
-		
-		self._buffer.append(value)
-		
-		if self._filepath:
-			with open(self._filepath,"a") as file:
-				if isinstance(value,List):
-					file.write(','.join([str(v) for v in value]) + '\n')
-				elif isinstance(value,Dict):
-					file.write(','.join([str(v) for k,v in value.items()])+'\n')
-				else:
-					file.write(str(value) + '\n')
-				
+		"""Add a value to the buffer. Works in a FIFO basis, overwriting the
+		oldest element once the buffer is full."""
+		if self._buffer is None or self._buffer.dtype != object:
+			self._allocate(value)
+
+		self._buffer[self._head] = value
+		self._buffer[self._head + self._buffer_size] = value
+		self._head = (self._head + 1) % self._buffer_size
+		if self._size < self._buffer_size:
+			self._size += 1
+
+		if self._writer:
+			self._writer.write(value)
 
 
 	def pop(self)->Any:
 		"""Returns the top value in the buffer and deletes it."""
-		return self._buffer.pop(-1)
+		value = self.get(-1)
+		self._head = (self._head - 1) % self._buffer_size
+		self._size -= 1
+		return value
 
 
 	def flush(self)->List[Any]:
 		"""Return the whole buffer and clear it."""
-		temp = self._buffer.copy()
-		self._buffer = []
+		temp = self.window().tolist()
+		self._size = 0
 		return temp
 
 
 	def is_full(self)->bool:
-		return len(self._buffer) == self._buffer_size
-	
-	
+		return self._size == self._buffer_size
+
+
 	def current_size(self)->int:
-		return len(self._buffer)
+		return self._size
+
+
+	def __len__(self)->int:
+		return self._size
 
 
 	def __str__(self)->str:
 		"""Copies the numpy array representation style of only showing the first
 		and last three values."""
-		if len(self._buffer) > 6:
-			return F"[{''.join(self._buffer[:3])} ... {','.join(self._buffer[-3:])}]"
+		values = self.get_all()
+		if len(values) > 6:
+			starting = ','.join([str(v) for v in values[:3]])
+			ending = ','.join([str(v) for v in values[-3:]])
+			return F"[{starting} ... {ending}]"
 		else:
-			return str(self._buffer)
\ No newline at end of file
+			return F"[{','.join([str(v) for v in values])}]"
@@ -0,0 +1,182 @@
+from __future__ import annotations
+from typing import List,Dict,Union,Any
+import numpy as np
+
+from Candle import CandleStore
+from Decision import Decision,decision_dtype
+from .Node import Node
+from .Terminal import Terminal
+
+class CompiledTree:
+    def __init__(self,
+                 root:int,
+                 indicators:List[Any],
+                 names:List[str],
+                 parameters:List[Dict],
+                 children:np.ndarray,
+                 labels:np.ndarray,
+                 lazy:bool=False):
+        """Flat form of a decision tree. Nodes are numbered in pre-order and
+        each row of children holds the BUY, HOLD and SELL branches of a node.
+        A branch is either the index of another node, or a negative value
+        -(t+1) pointing at terminal t in labels. Making a decision is then a
+        loop over integer tables rather than a recursive walk of objects.
+        Use CompiledTree.from_tree to build one.
+
+        A lazy tree only updates the indicators which carry state from every
+        candle when evaluated. Window only indicators are left alone until a
+        decision actually reaches their node, at which point they catch up on
+        the candles they missed from the store. Decisions are unchanged, but
+        nodes off the decision path cost nothing.
+        Parameters:
+            root (int): The root branch, which is -1 for a lone terminal.
+            indicators (List[Any]): The indicator of every node, or None for
+                trees which only describe their structure.
+            names (List[str]): The indicator name of every node.
+            parameters (List[Dict]): The indicator arguments of every node.
+            children (np.ndarray): int32 branches of shape (nodes,3).
+            labels (np.ndarray): The decision code of every terminal.
+            lazy (bool): Defer window only indicators to the decision path."""
+        self.root = root
+        self.indicators = indicators
+        self.names = names
+        self.parameters = parameters
+        self.children = children
+        self.labels = labels
+
+        # Plain tuples index faster than numpy arrays from python.
+        self._branches = tuple(tuple(row) for row in children.tolist())
+        self._labels = tuple(Decision(label) for label in labels.tolist())
+
+        # Nodes sharing a computation only need it advanced once.
+        computations = {}
+        for indicator in indicators:
+            if indicator is None:
+                continue
+            computation = indicator.computation()
+            computations.setdefault(id(computation),computation)
+        self._computations = tuple(computations.values())
+
+        self.lazy = lazy
+        self._candles = None
+        self._deferred = {id(c):c for c in self._computations
+                          if lazy and c.horizon() is not None}
+        self._eager = tuple(c for c in self._computations
+                            if id(c) not in self._deferred)
+        self._capacity = None
+        self._node_deferred = ()
+
+
+    @staticmethod
+    def from_tree(tree:Union[Node,Terminal],lazy:bool=False)->CompiledTree:
+        """Flattens an object tree. The indicator instances are reused, so the
+        compiled tree makes exactly the same decisions as the original."""
+        indicators = []
+        names = []
+        parameters = []
+        branches = []
+        labels = []
+
+        def flatten(node:Union[Node,Terminal])->int:
+            if isinstance(node,Terminal):
+                labels.append(node.decision())
+                return -len(labels)
+
+            index = len(indicators)
+            indicators.append(node.indicator())
+            names.append(node.name())
+            parameters.append(node.parameters())
+            branches.append(None)
+            branches[index] = [flatten(child) for child in node.children()]
+            return index
+
+        root = flatten(tree)
+        children = np.array(branches,dtype=np.int32).reshape(-1,3)
+        return CompiledTree(root,
+                            indicators,
+                            names,
+                            parameters,
+                            children,
+                            np.array(labels,dtype=decision_dtype),
+                            lazy=lazy)
+
+
+    @staticmethod
+    def from_dict(data:Dict)->CompiledTree:
+        """Flattens a parsed serialized tree without building any indicators.
+        The result cannot evaluate candles, but carries the names, parameters
+        and branches needed for batch evaluation such as Backtest."""
+        names = []
+        parameters = []
+        branches = []
+        labels = []
+
+        def flatten(tree:Dict)->int:
+            if "parent" not in tree:
+                labels.append(Decision[tree["variable"]])
+                return -len(labels)
+
+            index = len(names)
+            variable = tree["parent"]["variable"]
+            names.append(variable["name"])
+            parameters.append({k:v["value"]
+                               for k,v in variable["variables"].items()})
+            branches.append(None)
+            branches[index] = [flatten(child) for child in tree["children"]]
+            return index
+
+        root = flatten(data)
+        children = np.array(branches,dtype=np.int32).reshape(-1,3)
+        return CompiledTree(root,
+                            [None]*len(names),
+                            names,
+                            parameters,
+                            children,
+                            np.array(labels,dtype=decision_dtype))
+
+
+    def evaluate(self,candles:CandleStore):
+        """Update every distinct computation behind the nodes with the latest
+        candle."""
+        if not self.lazy:
+            for computation in self._computations:
+                computation.update(candles)
+            return
+
+        if self._capacity != candles.capacity():
+            self._plan_deferred(candles.capacity())
+        self._candles = candles
+        for computation in self._eager:
+            computation.update(candles)
+
+
+    def _plan_deferred(self,capacity:int):
+        """Indicators whose horizon reaches past the candles the store holds
+        cannot be replayed and stay eager."""
+        self._capacity = capacity
+        deferred = {k:c for k,c in self._deferred.items()
+                    if c.horizon() <= capacity}
+        self._eager = tuple(c for c in self._computations
+                            if id(c) not in deferred)
+        self._node_deferred = tuple(
+            deferred.get(id(indicator.computation()))
+            for indicator in self.indicators)
+
+
+    def decide(self)->Decision:
+        """Returns the decision reached by following each node's indicator
+        from the root down to a terminal."""
+        index = self.root
+        branches = self._branches
+        indicators = self.indicators
+        deferred = self._node_deferred
+        while index >= 0:
+            if deferred and deferred[index] is not None:
+                deferred[index].catch_up(self._candles)
+            decision = indicators[index].make_decision()
+            index = branches[index][decision]
+        return self._labels[-index-1]
+
+
+    def node_count(self)->int:
+        return len(self.indicators)
@@ -1,24 +1,29 @@
 from __future__ import annotations
-from typing import List,Union,Dict
+from typing import List,Union,Dict,Any
 import numpy as np
 import sys
 from copy import deepcopy
 
 sys.path.append("../Indicators")
+from Candle import CandleStore
 from Indicators.IndicatorVariables import indicator_variables
+from Indicators.IndicatorRegistry import IndicatorRegistry
 from .BaseNode import BaseNode
 from .Terminal import Terminal
 
 class Node(BaseNode):
-    def __init__(self,name:str,indicator:Any):
+    def __init__(self,name:str,indicator:Any,parameters:Dict=None):
         super().__init__()
         self._indicator = indicator
         self._name = name
+        self._parameters = parameters if parameters is not None else {}
         self._children = []
 
 
     @staticmethod
-    def node_from_dict(data:Dict)->Node:
+    def node_from_dict(data:Dict,registry:IndicatorRegistry=None)->Node:
+        """Build a node from its serialized form. With a registry, nodes of
+        the same tree which use the same indicator share its computation."""
         if data["type"] == "NODE":
             variable = [I for I in indicator_variables 
                         if I['name'] == data["variable"]["name"]][0]
@@ -26,26 +31,28 @@ class Node(BaseNode):
             raw_vars = data["variable"]["variables"]
             kwargs = {k:v["value"] for k,v in raw_vars.items()}
             
-            indicator = variable["generator"]
-            indicator = indicator(**kwargs)
-
-            return Node(name=variable["name"],indicator=indicator)
-
-
-    def evaluate(self,candles:List[Dict]):
-        """Generate the next value of the indicator."""
-        self._indicator.next_value(candles)
+            if registry is not None:
+                indicator = registry.indicator(variable["name"],
+                                               variable["generator"],
+                                               kwargs)
+            else:
+                indicator = variable["generator"](**kwargs)
+
+            return Node(name=variable["name"],
+                        indicator=indicator,
+                        parameters=kwargs)
+
+
+    def evaluate(self,candles:CandleStore):
+        """Generate the next value of the indicator. A shared indicator is
+        only advanced by the first node to evaluate it for a candle."""
+        self._indicator.update(candles)
     
 
-    def get_decision(self)->Node:
-        """Return an array mask of which decisions to make."""
-        decision = self._indicator.make_decision()
-        if decision == "BUY":
-            return self._children[0]
-        elif decision == "HOLD":
-            return self._children[1]
-        elif decision == "SELL":
-            return self._children[2]
+    def get_decision(self)->Union[Node,Terminal]:
+        """Returns the child the indicator's decision leads to. Decisions
+        index the BUY, HOLD and SELL children directly."""
+        return self._children[self._indicator.make_decision()]
 
 
     def add_child(self,node:Union[Node,Terminal],index:int=-1):
@@ -60,6 +67,19 @@ class Node(BaseNode):
         return self._children
 
 
+    def name(self)->str:
+        return self._name
+
+
+    def indicator(self)->Any:
+        return self._indicator
+
+
+    def parameters(self)->Dict:
+        """The keyword arguments the indicator was generated with."""
+        return self._parameters
+
+
     def __repr__(self):
         return str(self._indicator)
 
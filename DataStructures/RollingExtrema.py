@@ -0,0 +1,106 @@
+from __future__ import annotations
+from collections import deque
+import numpy as np
+
+class RollingExtrema:
+    def __init__(self,period:int,track_min:bool=True,track_max:bool=True):
+        """Streaming minimum and maximum over the last period values pushed.
+        Each extreme is kept in a monotonic deque of (index,value) pairs, so a
+        push is amortized O(1) and reading the extreme is O(1). Like np.min
+        and np.max, a NaN anywhere in the window makes the result NaN.
+        Parameters:
+            period (int): The number of latest values the extrema cover.
+            track_min (bool): Whether to maintain the minimum.
+            track_max (bool): Whether to maintain the maximum."""
+        self._period = period
+        self._count = 0
+        self._last_nan = -period
+        self._mins = deque() if track_min else None
+        self._maxs = deque() if track_max else None
+
+
+    def push(self,value:float):
+        """Add the next value, expiring the one which left the window."""
+        index = self._count
+        self._count += 1
+        expired = index - self._period
+
+        mins = self._mins
+        maxs = self._maxs
+        if value != value:
+            self._last_nan = index
+        else:
+            if mins is not None:
+                while mins and mins[-1][1] >= value:
+                    mins.pop()
+                mins.append((index,value))
+            if maxs is not None:
+                while maxs and maxs[-1][1] <= value:
+                    maxs.pop()
+                maxs.append((index,value))
+
+        while mins and mins[0][0] <= expired:
+            mins.popleft()
+        while maxs and maxs[0][0] <= expired:
+            maxs.popleft()
+
+
+    def _window_has_nan(self)->bool:
+        return self._last_nan > self._count - 1 - self._period
+
+
+    def minimum(self)->float:
+        """Returns the lowest value in the window."""
+        if self._window_has_nan():
+            return np.nan
+        return self._mins[0][1]
+
+
+    def maximum(self)->float:
+        """Returns the highest value in the window."""
+        if self._window_has_nan():
+            return np.nan
+        return self._maxs[0][1]
+
+
+    def current_size(self)->int:
+        return min(self._count,self._period)
+
+
+def _rolling_extreme(data:np.array,
+                     period:int,
+                     ufunc:np.ufunc,
+                     neutral:float)->np.array:
+    """Van Herk/Gil-Werman rolling reduction. The data is split into blocks
+    of period values and the running extreme is taken forwards and backwards
+    within every block. Any window then spans at most two blocks, so its
+    extreme is the backward value at its start combined with the forward
+    value at its end. Runs in O(n) regardless of the period."""
+    data = np.asarray(data,dtype=np.float64)
+    size = data.shape[0]
+    output = np.full(size,np.nan)
+    if period > size:
+        return output
+
+    blocks = -(-size // period)
+    padded = np.full(blocks*period,neutral)
+    padded[:size] = data
+    padded = padded.reshape(blocks,period)
+
+    forward = ufunc.accumulate(padded,axis=1).ravel()
+    backward = ufunc.accumulate(padded[:,::-1],axis=1)[:,::-1].ravel()
+
+    output[period-1:] = ufunc(backward[:size-period+1],forward[period-1:size])
+    return output
+
+
+def rolling_minimum(data:np.array,period:int)->np.array:
+    """Minimum of every window of period values. The first period-1 entries
+    are NaN so the output lines up with the input."""
+    return _rolling_extreme(data,period,np.minimum,np.inf)
+
+
+def rolling_maximum(data:np.array,period:int)->np.array:
+    """Maximum of every window of period values. The first period-1 entries
+    are NaN so the output lines up with the input."""
+    return _rolling_extreme(data,period,np.maximum,-np.inf)
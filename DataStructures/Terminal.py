@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import Dict,List
 from .BaseNode import BaseNode
+from Decision import Decision
 
 class Terminal(BaseNode):
     def __init__(self,var_name:str,is_fixed:bool=False):
@@ -16,6 +17,9 @@ class Terminal(BaseNode):
                 var_name=data["variable"],
                 is_fixed=data["fixed"])
 
+    def decision(self)->Decision:
+        return Decision[self._variable]
+
     def node_as_dict(self)->Dict:
         return {
             "type":"TERMINAL",
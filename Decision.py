@@ -0,0 +1,47 @@
+from __future__ import annotations
+from typing import List
+from enum import IntEnum
+import numpy as np
+
+class Decision(IntEnum):
+    """The decision of an indicator, tree node or whole tree. The values index
+    the BUY, HOLD and SELL children of a node, and arrays of decisions are
+    stored as decision_dtype."""
+    BUY = 0
+    HOLD = 1
+    SELL = 2
+
+decision_dtype = np.int8
+decision_names = np.array([d.name for d in Decision])
+
+
+def decision_array(size:int,fill:Decision=Decision.HOLD)->np.ndarray:
+    """Returns a new array of size decisions all set to fill."""
+    return np.full(size,fill,dtype=decision_dtype)
+
+
+def decision_strings(decisions:np.ndarray)->np.ndarray:
+    """Converts decision codes to their names. Only meant for reporting."""
+    return decision_names[np.asarray(decisions)]
+
+
+def decisions_from_strings(decisions:List[str])->np.ndarray:
+    """Converts BUY/HOLD/SELL strings to decision codes. Anything else is
+    read as HOLD."""
+    decisions = np.asarray(decisions)
+    codes = decision_array(decisions.shape[0])
+    codes[decisions == "BUY"] = Decision.BUY
+    codes[decisions == "SELL"] = Decision.SELL
+    return codes
+
+
+def save_decisions(path:str,decisions:np.ndarray):
+    """Writes decision codes to a .npy file which load_decisions can memory
+    map."""
+    np.save(path,np.asarray(decisions,dtype=decision_dtype))
+
+
+def load_decisions(path:str,mmap:bool=True)->np.ndarray:
+    """Reads decision codes written by save_decisions. With mmap the file is
+    paged in on demand instead of read into memory."""
+    return np.load(path,mmap_mode="r" if mmap else None)
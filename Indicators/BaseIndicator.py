@@ -2,20 +2,67 @@ from __future__ import annotations
 from typing import List,Dict,Any
 import numpy as np
 
+from Decision import Decision
+
 class BaseIndicator:
 	def __init__(self):
 		self._indicator_buffer = None
+		self._stamp = None
+		self._value = None
 
 	def next_value(self)->Any:
 		print("Method not implemented in subclass.")
 		return None
 
-	def get_indicator(self)->List[Any]:
-		return self._indicator_buffer.get_all()
+	def update(self,candles:Any)->Any:
+		"""Advances the indicator with the latest candle in the store and
+		returns its value. Further calls before the next candle is pushed just
+		return the same value, so any number of tree nodes or parent
+		indicators can share one instance."""
+		stamp = candles.pushed()
+		if self._stamp != stamp:
+			self._stamp = stamp
+			self._value = self.next_value(candles)
+		return self._value
+
+	def horizon(self)->int:
+		"""The number of latest candles which fully determine the decision
+		of a window only indicator, or None when it carries state from every
+		candle it has seen and has to be updated on each one."""
+		return None
+
+	def reset(self):
+		"""Clears the window state of an indicator which has a horizon."""
+		print("Method not implemented in subclass.")
+
+	def catch_up(self,candles:Any)->Any:
+		"""Brings a window only indicator which has been skipped up to date
+		with the store and returns its value. The candles missed are replayed
+		through views of the store, but once more than the horizon have been
+		missed the indicator is reset and only the last horizon candles are
+		replayed, which leaves it making the same decision as if it had been
+		updated on every candle."""
+		horizon = self.horizon()
+		stamp = candles.pushed()
+		missed = stamp - (self._stamp or 0)
+		if missed >= horizon:
+			self.reset()
+			missed = min(horizon,stamp)
+
+		for lag in range(missed-1,-1,-1):
+			self.update(candles.as_of(lag))
+		return self._value
+
+	def computation(self)->BaseIndicator:
+		"""Returns the instance which owns the state behind this indicator."""
+		return self
+
+	def get_indicator(self)->np.ndarray:
+		return self._indicator_buffer.as_array()
 
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
 		print("Method not implemented in subclass.")
-		return ""
+		return Decision.HOLD
 	
 	def __str__(self)->str:
 		"""Copies the numpy array representation style of only showing the first
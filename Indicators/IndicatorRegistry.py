@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import Dict,Any,Callable,Tuple
+import inspect
+import numpy as np
+
+from .BaseIndicator import BaseIndicator
+from Decision import Decision
+
+# Parameters which only change how a series is turned into a decision.
+threshold_parameters = ("buy_threshold","sell_threshold")
+
+
+class ThresholdView(BaseIndicator):
+	def __init__(self,
+				 computation:BaseIndicator,
+				 buy_threshold:float,
+				 sell_threshold:float):
+		"""An indicator which reads the series of another instance but decides
+		against its own thresholds. Updating the view updates the shared
+		instance, which only does work once per candle."""
+		super().__init__()
+		self._computation = computation
+		self._buyt = buy_threshold
+		self._sellt = sell_threshold
+
+	def next_value(self,candles:Any)->Any:
+		return self._computation.update(candles)
+
+	def update(self,candles:Any)->Any:
+		return self._computation.update(candles)
+
+	def computation(self)->BaseIndicator:
+		return self._computation
+
+	def get_indicator(self)->np.ndarray:
+		return self._computation.get_indicator()
+
+	def make_decision(self)->Decision:
+		return self._computation.decide(self._buyt,self._sellt)
+
+	def __str__(self)->str:
+		return str(self._computation)
+
+
+class SourcedIndicator(BaseIndicator):
+	def __init__(self,indicator:BaseIndicator,source:Callable[[Any],Any]):
+		"""Adapts an indicator which runs over a data series, such as an EMA,
+		so it can be driven straight from the candle store. source maps the
+		store to the series to feed it."""
+		super().__init__()
+		self._indicator = indicator
+		self._source = source
+
+	def next_value(self,candles:Any)->Any:
+		return self._indicator.next_value(self._source(candles))
+
+	def get_indicator(self)->np.ndarray:
+		return self._indicator.get_indicator()
+
+
+class IndicatorSource:
+	def __init__(self,indicator:BaseIndicator):
+		"""Source reading the values of another candle driven indicator, which
+		is brought up to date first."""
+		self._indicator = indicator
+
+	def __call__(self,candles:Any)->np.ndarray:
+		self._indicator.update(candles)
+		return self._indicator.get_indicator()
+
+
+def _accepts_registry(generator:Callable)->bool:
+	return "registry" in inspect.signature(generator).parameters
+
+
+def _freeze(parameters:Dict)->Tuple:
+	return tuple(sorted(parameters.items()))
+
+
+class IndicatorRegistry:
+	def __init__(self):
+		"""Canonicalizes the indicators of a tree so every distinct indicator
+		is computed once per candle no matter how many nodes reference it.
+		Nodes with the same name and parameters share an instance, nodes which
+		only differ in their thresholds share one computation through a
+		ThresholdView, and indicators share sub components such as the EMA of
+		closes or the accumulation distribution line."""
+		self._indicators = {}
+		self._components = {}
+
+
+	def indicator(self,name:str,generator:Callable,kwargs:Dict)->BaseIndicator:
+		"""Returns the indicator for a node built by generator(**kwargs)."""
+		key = (name,_freeze(kwargs))
+		if key in self._indicators:
+			return self._indicators[key]
+
+		series_kwargs = {k:v for k,v in kwargs.items()
+						 if k not in threshold_parameters}
+		series_key = (name,_freeze(series_kwargs))
+		computation = self._indicators.get(series_key)
+
+		if computation is not None and hasattr(computation,"decide"):
+			indicator = ThresholdView(
+				computation,
+				buy_threshold=kwargs.get("buy_threshold",computation._buyt),
+				sell_threshold=kwargs.get("sell_threshold",computation._sellt))
+		else:
+			if _accepts_registry(generator):
+				indicator = generator(registry=self,**kwargs)
+			else:
+				indicator = generator(**kwargs)
+			self._indicators.setdefault(series_key,indicator)
+
+		self._indicators[key] = indicator
+		return indicator
+
+
+	def component(self,key:Tuple,factory:Callable[[],BaseIndicator])->BaseIndicator:
+		"""Returns the sub component stored under key, building it with factory
+		the first time it is asked for."""
+		if key not in self._components:
+			self._components[key] = factory()
+		return self._components[key]
+
+
+	def unique_count(self)->int:
+		"""The number of distinct computations handed out."""
+		return len({id(i.computation()) for i in self._indicators.values()})
+
+
+def shared_component(registry:IndicatorRegistry,
+					 key:Tuple,
+					 factory:Callable[[],BaseIndicator])->BaseIndicator:
+	"""Fetches a sub component from the registry when there is one, otherwise
+	builds a private instance."""
+	if registry is None:
+		return factory()
+	return registry.component(key,factory)
@@ -5,8 +5,8 @@ import numpy as np
 import sys
 sys.path.append("../")
 
-from Candle import new_candle
-from DataBuffer import DataBuffer
+from Candle import new_candle,CandleStore,candles_from_ticker
+from TickerData import load_ticker,ticker_rows
 
 from Indicators import (
 	RelativeStrengthIndex,
@@ -14,7 +14,8 @@ from Indicators import (
 	MoneyFlowIndex,
 	ChaikinOscillator,
 	MovingAverageConverganceDivergence,
-	StochasticOscillator)
+	StochasticOscillator,
+	SimpleMovingAverage)
 
 from RawIndicators.RawIndicators import (
 	relative_strength_index,
@@ -22,7 +23,8 @@ from RawIndicators.RawIndicators import (
 	money_flow_index,
 	chaikin_oscillator,
 	moving_average_convergance_divergance,
-	stochastic_oscillator)
+	stochastic_oscillator,
+	simple_moving_average)
 
 candle_period = 30
 prev_volume = 0.0
@@ -65,84 +67,11 @@ def update_current_candle(candle:Dict,
 	return False
 
 
-def arange_with_endpoint(data:np.array,step:int)->np.array:
-    """Convenience function to get around the fact that the np.arange function
-    doesnt consider the endpoint properly. They reccomend using linspace to
-    solve this, but we need arange, so we manually consider the endpoint.
-    Returns the arange results."""
-    aranged = np.arange(0,data.shape[0],step=step)
-    
-    # Adjust for how np.arange fails to consider the endpoint
-    if aranged[-1] < data.shape[0] and (aranged[-1]+step) < data.shape[0]:
-        aranged =np.append(aranged,aranged[-1]+period)
-    return aranged
-
-
-def convert_ticker_to_candles(ticker:pd.DataFrame,
-							  period:int=30)->pd.DataFrame:
-	"""Generates a dataframe of candle data using the specified options. Prices
-	used are the best_asks. Volumes are determined by messing with the 24hour
-	traded volume that we get each second. We diff the volumes to see how it
-	changes every second and then cumsum with an initial starting volume to
-	generate the volume traded at every second.
-	Parameters:
-		ticker (pd.DataFrame): The raw price and voluem data collected
-		period (int): This is the candle stick period in seconds.
-	Returns a new dataframe which only contains the candlestick data."""
-	prices = ticker["best_ask"].values
-
-	seed_volume = 100000.0 
-	volume_data = np.diff(ticker["total_traded_asset"].values)
-	volume_data = np.cumsum(np.insert(volume_data,0,seed_volume))
-	open_idx = arange_with_endpoint(data=ticker.index.values,step=period)
-	close_idx = np.add(open_idx,period-1)
-
-	opens = prices[open_idx]
-	if close_idx[-1] > prices.shape[0]:
-		closes = prices[close_idx[:-1]]
-		closes = np.append(closes,prices[-1])
-	else:
-		closes = prices[close_idx]
-
-	highs = []
-	lows = []
-	volumes = []
-	elements = []
-
-	for o,c in zip(open_idx,close_idx):
-		# Add one because numpy indexing excludes the last
-		temp = prices[o:c+1]
-		if len(temp) < period:
-			open_idx = open_idx[:-1]
-			close_idx = close_idx[:-1]
-			opens = opens[:-1]
-			closes = closes[:-1]
-			break
-		highs.append(np.max(temp))
-		lows.append(np.min(temp))
-		volumes.append(np.sum(volume_data[o:c+1]))
-		elements.append(len(temp))
-
-	candles = pd.DataFrame()
-	candles["index"] = np.array(open_idx,dtype=np.intc)
-	candles["open"] = np.array(opens,dtype=np.float64)
-	candles["close"] = np.array(closes,dtype=np.float64)
-	candles["low"] = np.array(lows,dtype=np.float64)
-	candles["high"] = np.array(highs,dtype=np.float64)
-	candles["volume"] = np.array(volumes,dtype=np.float64)
-	candles["elements"] = np.array(elements,dtype=np.intc)
-	return candles
-
-
 def main():
-	ticker_data = pd.read_csv("../Data/BTCUSDT_ticker.csv")
-	ticker_data = ticker_data[["best_bid","best_ask","total_traded_asset"]]
-	ticker_data = ticker_data.to_dict("records")
+	ticker_data = load_ticker("../Data/BTCUSDT_ticker.csv")
 
 	current_candle = new_candle()
-	candles = DataBuffer(max_size=300,
-						 filename="candles.csv",
-						 header=["open","high","low","close","volume","elements"])
+	candles = CandleStore(max_size=300,filename="candles.csv")
 
 	
 	# -------------------------------------------------------
@@ -176,25 +105,26 @@ def main():
 							buy_threshold=20,
 							sell_threshold=80,
 							buffer_size=250)
+	sma_class_values = []
+	sma_class = SimpleMovingAverage(period=18,buffer_size=250)
 	# -------------------------------------------------------
 	
 	ramp_up_candles = 100
-	for data in ticker_data:
+	for data in ticker_rows(ticker_data):
 		# Only push a new candle if it is completed aka the full period.
 		if update_current_candle(current_candle,data):
 			candles.push(current_candle)
-			rsi_class_values.append(rsi_class.next_value(candles.get_all()))
-			mfi_class_values.append(mfi_class.next_value(candles.get_all()))
-			bop_class_values.append(bop_class.next_value(candles.get_all()))
-			macd_class_values.append(macd_class.next_value(candles.get_all()))
-			stochastic_class_values.append(stochastic_class.next_value(candles.get_all()))
+			rsi_class_values.append(rsi_class.next_value(candles))
+			mfi_class_values.append(mfi_class.next_value(candles))
+			bop_class_values.append(bop_class.next_value(candles))
+			macd_class_values.append(macd_class.next_value(candles))
+			stochastic_class_values.append(stochastic_class.next_value(candles))
+			sma_class_values.append(sma_class.next_value(candles.closes()))
 			current_candle = new_candle()
 
 	# -------------------------------------------------------
 	# Compute the numpy indicators
-	ticker_data = pd.read_csv("../Data/BTCUSDT_ticker.csv")
-	ticker_data = ticker_data[["best_bid","best_ask","total_traded_asset"]]
-	candles_df = convert_ticker_to_candles(ticker_data,candle_period)
+	candles_df = candles_from_ticker(ticker_data,candle_period)
 	candles_df.to_csv("../buffers/candles_df_debug.csv")
 
 	rsi_np_values = list(relative_strength_index(candles_df,18))
@@ -203,6 +133,7 @@ def main():
 	_,_,macd_np_values = moving_average_convergance_divergance(candles_df["close"].values,9,18,6)
 	macd_np_values = list(macd_np_values)
 	stochastic_np_values = list(stochastic_oscillator(candles_df,14,3))
+	sma_np_values = list(simple_moving_average(candles_df["close"].values,18))
 
 	# -------------------------------------------------------
 
@@ -232,6 +163,11 @@ def main():
 	stochasticB = np.array(stochastic_class_values[14:])
 	np.testing.assert_allclose(stochasticA,stochasticB,rtol=1e-12)
 
+	print("SMA Test")
+	smaA = np.array(sma_np_values[18:])
+	smaB = np.array(sma_class_values[18:])
+	np.testing.assert_allclose(smaA,smaB,rtol=1e-12)
+
 	print("Tests Passed!")
 
 if __name__ == "__main__":
@@ -1,9 +1,18 @@
 from __future__ import annotations
 from typing import List,Dict,Any
 import numpy as np
+import math
 
 from .BaseIndicator import BaseIndicator
+from .IndicatorRegistry import (
+	IndicatorRegistry,
+	SourcedIndicator,
+	IndicatorSource,
+	shared_component)
 from DataBuffer import DataBuffer
+from Candle import CandleStore
+from Decision import Decision
+from DataStructures.RollingExtrema import RollingExtrema
 
 
 class Derivative(BaseIndicator):
@@ -34,6 +43,24 @@ class Derivative(BaseIndicator):
 		return derivative
 
 
+def exact_add(partials:List[float],value:float):
+	"""Adds value into a list of non overlapping partial sums without any
+	rounding error, following Shewchuk's algorithm as used by math.fsum. The
+	correctly rounded total is math.fsum(partials), which makes a running sum
+	kept this way independent of the order values were added and removed."""
+	i = 0
+	for partial in partials:
+		if abs(value) < abs(partial):
+			value,partial = partial,value
+		high = value + partial
+		low = partial - (high - value)
+		if low:
+			partials[i] = low
+			i += 1
+		value = high
+	partials[i:] = [value]
+
+
 def next_simple_moving_average(data:List[float],period:int)->float:
 	"""Given the raw period data, returns the next simple moving average 
 	datapoint"""
@@ -54,11 +81,40 @@ class SimpleMovingAverage(BaseIndicator):
 		for _ in range(period-1):
 			self._indicator_buffer.push(np.nan)
 
+		# Running sum over the last period inputs. Non finite inputs are
+		# counted instead of summed so they can leave the window again.
+		self._window = DataBuffer(max_size=period,dtype=np.float64)
+		self._partials = []
+		self._non_finite = 0
+
+
+	def _slide_window(self,value:float):
+		if self._window.is_full():
+			oldest = self._window.get(0)
+			if math.isfinite(oldest):
+				exact_add(self._partials,-oldest)
+			else:
+				self._non_finite -= 1
+
+		if math.isfinite(value):
+			exact_add(self._partials,value)
+		else:
+			self._non_finite += 1
+		self._window.push(value)
+
+
 	def next_value(self,data:List[float])->float:
+		"""Expects data to have grown by exactly one value since the last call,
+		which is then added to the running sum so each update is O(1) no matter
+		the period."""
+		self._slide_window(data[-1])
 		if len(data) < self._period:
 			return self._indicator_buffer.get(-1)
 
-		sma = np.sum(data[-self._period:]) / self._period
+		if self._non_finite:
+			sma = np.sum(self._window.as_array()) / self._period
+		else:
+			sma = math.fsum(self._partials) / self._period
 		self._indicator_buffer.push(sma)
 
 		return sma
@@ -114,21 +170,23 @@ class AccumulationDistributionLine(BaseIndicator):
 		else:
 			self._indicator_buffer = DataBuffer(max_size=buffer_size)
 	
-	def next_value(self,candles:List[Dict])->float:
-		latest = candles[-1]
-		close_low = latest["close"]-latest["low"]
-		high_close = latest["high"]-latest["close"]
-		high_low = latest["high"]-latest["low"]
+	def next_value(self,candles:CandleStore)->float:
+		high = candles.latest("high")
+		low = candles.latest("low")
+		close = candles.latest("close")
+		close_low = close-low
+		high_close = high-close
+		high_low = high-low
 		
-		try:
-			money_flow_multiplier = (close_low - high_close) / high_low
-		except:
+		if high_low == 0:
 			money_flow_multiplier = 0
+		else:
+			money_flow_multiplier = (close_low - high_close) / high_low
 		
 		prev_adl = 0
 		if self._indicator_buffer.current_size() != 0:
 			prev_adl = self._indicator_buffer.get(-1)
-		adl = money_flow_multiplier * latest["volume"]
+		adl = money_flow_multiplier * candles.latest("volume")
 		adl = prev_adl + adl
 
 		self._indicator_buffer.push(adl)
@@ -141,16 +199,25 @@ class ChaikinOscillator(BaseIndicator):
 				 fast_period:int=3,
 				 signal_period:int=9,
 				 buffer_size:int=250,
-				 output:bool=False):
+				 output:bool=False,
+				 registry:IndicatorRegistry=None):
 		super().__init__()
 		# Purely for reporting
 		self._fast_period = fast_period
 		self._slow_period = slow_period
 		self._signal_period = signal_period
 		
-		self._adl = AccumulationDistributionLine()
-		self._fast_ema = ExponentialMovingAverage(fast_period)
-		self._slow_ema = ExponentialMovingAverage(slow_period)
+		# The ADL and its EMAs are shared with other Chaikin oscillators when
+		# built through a registry.
+		self._adl = shared_component(registry,("adl",),
+			AccumulationDistributionLine)
+		adl_values = IndicatorSource(self._adl)
+		self._fast_ema = shared_component(registry,("adl_ema",fast_period),
+			lambda: SourcedIndicator(
+				ExponentialMovingAverage(fast_period),adl_values))
+		self._slow_ema = shared_component(registry,("adl_ema",slow_period),
+			lambda: SourcedIndicator(
+				ExponentialMovingAverage(slow_period),adl_values))
 		self._signal_sma = SimpleMovingAverage(signal_period)
 
 		if output:
@@ -163,31 +230,30 @@ class ChaikinOscillator(BaseIndicator):
 			self._indicator_buffer = DataBuffer(max_size=buffer_size)
 	
 
-	def next_value(self,candles:List[Dict])->float:
-		self._adl.next_value(candles)
-
-		fast_value = self._fast_ema.next_value(self._adl.get_indicator())
-		slow_value = self._slow_ema.next_value(self._adl.get_indicator())
+	def next_value(self,candles:CandleStore)->float:
+		fast_value = self._fast_ema.update(candles)
+		slow_value = self._slow_ema.update(candles)
 		chaikin = fast_value-slow_value
 		self._chaikin_buffer.push(chaikin)
 
-		signal_value = self._signal_sma.next_value(self._chaikin_buffer.get_all())
+		signal_value = self._signal_sma.next_value(
+			self._chaikin_buffer.window(self._signal_period))
 		signal_value = chaikin - signal_value
 		self._indicator_buffer.push(signal_value)
 
 		return chaikin
 
 
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
 		previous_value = self._indicator_buffer.get(-2)
 		latest_value = self._indicator_buffer.get(-1)
 
 		if latest_value > 0 and previous_value < 0:
-			return "BUY"
+			return Decision.BUY
 		if latest_value < 0 and previous_value > 0:
-			return "SELL"
+			return Decision.SELL
 		
-		return "HOLD"
+		return Decision.HOLD
 
 
 	def __str__(self):
@@ -200,15 +266,22 @@ class MovingAverageConverganceDivergence(BaseIndicator):
 				 slow_period:int=18,
 				 signal_period:int=6,
 				 buffer_size:int=250,
-				 output:bool=False):
+				 output:bool=False,
+				 registry:IndicatorRegistry=None):
 		super().__init__()
 		# Purely for reporting
 		self._fast_period = fast_period
 		self._slow_period = slow_period
 		self._signal_period = signal_period
 
-		self._fast_ema = ExponentialMovingAverage(fast_period)
-		self._slow_ema = ExponentialMovingAverage(slow_period)
+		# EMAs of the closes are shared with other indicators when built
+		# through a registry.
+		self._fast_ema = shared_component(registry,("close_ema",fast_period),
+			lambda: SourcedIndicator(
+				ExponentialMovingAverage(fast_period),CandleStore.closes))
+		self._slow_ema = shared_component(registry,("close_ema",slow_period),
+			lambda: SourcedIndicator(
+				ExponentialMovingAverage(slow_period),CandleStore.closes))
 		self._signal_ema = ExponentialMovingAverage(signal_period)
 
 		if output:
@@ -221,31 +294,30 @@ class MovingAverageConverganceDivergence(BaseIndicator):
 			self._indicator_buffer = DataBuffer(max_size=buffer_size)
 
 
-	def next_value(self,candles:List[Dict])->float:
-		closes = [c["close"] for c in candles]
-		
-		fast_value = self._fast_ema.next_value(closes)
-		slow_value = self._slow_ema.next_value(closes)
+	def next_value(self,candles:CandleStore)->float:
+		fast_value = self._fast_ema.update(candles)
+		slow_value = self._slow_ema.update(candles)
 		
 		macd = fast_value - slow_value
 		self._macd_buffer.push(macd)
 		
-		signal_value = self._signal_ema.next_value(self._macd_buffer.get_all())
+		signal_value = self._signal_ema.next_value(
+			self._macd_buffer.as_array())
 		signal_value = macd - signal_value
 		self._indicator_buffer.push(signal_value)
 
 		return signal_value
 
 	
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
 		previous_value = self._indicator_buffer.get(-2)
 		latest_value = self._indicator_buffer.get(-1)
 
 		if latest_value > 0 and previous_value < 0:
-			return "BUY"
+			return Decision.BUY
 		if latest_value < 0 and previous_value > 0:
-			return "SELL"
-		return "HOLD"
+			return Decision.SELL
+		return Decision.HOLD
 
 		
 	def __str__(self):
@@ -264,10 +336,7 @@ class MoneyFlowIndex(BaseIndicator):
 		self._buyt = buy_threshold
 		self._sellt = sell_threshold
 
-		self._prev_typical_price = None
-		self._positive_money = DataBuffer(max_size=period)
-		self._negative_money = DataBuffer(max_size=period)
-		self._index = 0
+		self.reset()
 		if output:
 			self._indicator_buffer = DataBuffer(
 				max_size=buffer_size,
@@ -280,11 +349,24 @@ class MoneyFlowIndex(BaseIndicator):
 			self._indicator_buffer.push(np.nan)
 
 
-	def next_value(self,candles:List[Dict])->float:
-		prices = candles[-1]["high"]+candles[-1]["low"]+candles[-1]["close"]
+	def reset(self):
+		self._prev_typical_price = None
+		self._positive_money = DataBuffer(max_size=self._period)
+		self._negative_money = DataBuffer(max_size=self._period)
+		self._index = 0
+
+
+	def horizon(self)->int:
+		"""The money sums cover the last period price changes."""
+		return self._period + 1
+
+
+	def next_value(self,candles:CandleStore)->float:
+		prices = candles.latest("high")+candles.latest("low")\
+			+candles.latest("close")
 		typical_price = np.divide(prices,3)
 
-		raw_money_flow = abs(typical_price*candles[-1]["volume"])
+		raw_money_flow = abs(typical_price*candles.latest("volume"))
 
 		# Build up the money buffers to the period size.
 		if self._prev_typical_price is None:
@@ -306,8 +388,8 @@ class MoneyFlowIndex(BaseIndicator):
 			return self._indicator_buffer.get(-1)
 
 		# Once we have enough data points stored in positive and negative money
-		period_positive_money = np.sum(self._positive_money.get_all())
-		period_negative_money = np.sum(self._negative_money.get_all())
+		period_positive_money = np.sum(self._positive_money.as_array())
+		period_negative_money = np.sum(self._negative_money.as_array())
 		if period_negative_money == 0:
 			period_negative_money = 1
 
@@ -318,14 +400,20 @@ class MoneyFlowIndex(BaseIndicator):
 		return mfi
 
 	
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
+		return self.decide(self._buyt,self._sellt)
+
+
+	def decide(self,buy_threshold:float,sell_threshold:float)->Decision:
+		"""Makes the decision against the given thresholds instead of the
+		ones the indicator was built with."""
 		latest_value = self._indicator_buffer.get(-1)
 
-		if latest_value <= self._buyt:
-			return "BUY"
-		if latest_value >= self._sellt:
-			return "SELL"
-		return "HOLD"
+		if latest_value <= buy_threshold:
+			return Decision.BUY
+		if latest_value >= sell_threshold:
+			return Decision.SELL
+		return Decision.HOLD
 
 		
 	def __str__(self):
@@ -362,14 +450,13 @@ class RelativeStrengthIndex(BaseIndicator):
 			self._indicator_buffer.push(np.nan)
 
 
-	def next_value(self,candles:List[Dict])->float:
+	def next_value(self,candles:CandleStore)->float:
 		if len(candles) < 2:
 			self._gains.push(0.0)
 			self._losses.push(0.0)
 			return self._indicator_buffer.get(-1)
 
-		current = candles[-1]["close"]
-		previous = candles[-2]["close"]
+		previous,current = candles.closes(2)
 		price_change = current - previous
 
 		# Build up the gain/loss buffers to the period size.	
@@ -385,8 +472,8 @@ class RelativeStrengthIndex(BaseIndicator):
 		
 		# The first previous RS is just the average gain/loss
 		if self._prev_avg_gain is None:
-			self._prev_avg_gain = np.mean(self._gains.get_all())
-			self._prev_avg_loss = np.mean(self._losses.get_all())
+			self._prev_avg_gain = np.mean(self._gains.as_array())
+			self._prev_avg_loss = np.mean(self._losses.as_array())
 		else:
 			old_gain = self._prev_avg_gain*(self._period-1)
 			new_gain = (old_gain + self._gains.get(-1))/self._period
@@ -407,14 +494,20 @@ class RelativeStrengthIndex(BaseIndicator):
 		return rsi
 
 	
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
+		return self.decide(self._buyt,self._sellt)
+
+
+	def decide(self,buy_threshold:float,sell_threshold:float)->Decision:
+		"""Makes the decision against the given thresholds instead of the
+		ones the indicator was built with."""
 		latest_value = self._indicator_buffer.get(-1)
 
-		if latest_value <= self._buyt:
-			return "BUY"
-		if latest_value >= self._sellt:
-			return "SELL"
-		return "HOLD"
+		if latest_value <= buy_threshold:
+			return Decision.BUY
+		if latest_value >= sell_threshold:
+			return Decision.SELL
+		return Decision.HOLD
 
 		
 	def __str__(self):
@@ -435,10 +528,7 @@ class BalanceOfPower(BaseIndicator):
 		self._sellt = sell_threshold
 		self._detivative_resoluton = derivative_resolution
 
-		self._sma = SimpleMovingAverage(period,buffer_size=250)
-		self._raw_bop = DataBuffer(max_size=period)
-		self._derivative = Derivative(derivative_resolution,period)
-
+		self.reset()
 		if output:
 			self._indicator_buffer = DataBuffer(
 				max_size=buffer_size,
@@ -451,19 +541,30 @@ class BalanceOfPower(BaseIndicator):
 			self._indicator_buffer.push(np.nan)
 
 
-	def next_value(self,candles:List[Dict])->float:
-		latest = candles[-1]
-		close_open = latest["close"]-latest["open"]
-		high_low = latest["high"]-latest["low"]
-		try:
-			value = close_open / high_low
-		except:
+	def reset(self):
+		self._sma = SimpleMovingAverage(self._period,buffer_size=250)
+		self._raw_bop = DataBuffer(max_size=self._period)
+		self._derivative = Derivative(self._detivative_resoluton,self._period)
+
+
+	def horizon(self)->int:
+		"""The derivative looks back over resolution averages of period
+		candles each."""
+		return self._period + self._detivative_resoluton - 1
+
+
+	def next_value(self,candles:CandleStore)->float:
+		close_open = candles.latest("close")-candles.latest("open")
+		high_low = candles.latest("high")-candles.latest("low")
+		if high_low == 0:
 			value = np.nan
+		else:
+			value = close_open / high_low
 		self._raw_bop.push(value)
 		
 		bop_sma = None
 		if self._period > 1:
-			bop_sma = self._sma.next_value(self._raw_bop.get_all())
+			bop_sma = self._sma.next_value(self._raw_bop.as_array())
 
 		if len(self._sma.get_indicator()) < self._period-1:
 			return self._indicator_buffer.get(-1)
@@ -474,15 +575,21 @@ class BalanceOfPower(BaseIndicator):
 		return self._indicator_buffer.get(-1)
 
 	
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
+		return self.decide(self._buyt,self._sellt)
+
+
+	def decide(self,buy_threshold:float,sell_threshold:float)->Decision:
+		"""Makes the decision against the given thresholds instead of the
+		ones the indicator was built with."""
 		latest_bop = self._indicator_buffer.get(-1)
 		latest_derivative = self._derivative.get_indicator()[-1]
 
-		if latest_bop <= self._buyt and latest_derivative < 0:
-			return "BUY"
-		if latest_bop >= self._sellt and latest_derivative > 0:
-			return "SELL"
-		return "HOLD"
+		if latest_bop <= buy_threshold and latest_derivative < 0:
+			return Decision.BUY
+		if latest_bop >= sell_threshold and latest_derivative > 0:
+			return Decision.SELL
+		return Decision.HOLD
 
 	
 	def __str__(self):
@@ -502,12 +609,9 @@ class StochasticOscillator(BaseIndicator):
 		self._buyt = buy_threshold
 		self._sellt = sell_threshold
 
-		self._highs = DataBuffer(max_size=period)
-		self._lows = DataBuffer(max_size=period)
-
-		self._raw_stochastic =DataBuffer(max_size=120)
-		self._sma = SimpleMovingAverage(signal_period,buffer_size=signal_period)
+		self._sma_period = signal_period
 
+		self.reset()
 		if output:
 			self._indicator_buffer = DataBuffer(
 				max_size=buffer_size,
@@ -520,34 +624,56 @@ class StochasticOscillator(BaseIndicator):
 			self._indicator_buffer.push(np.nan)
 
 
-	def next_value(self,candles:List[Dict])->float:
-		latest = candles[-1]
-		self._highs.push(latest["high"])
-		self._lows.push(latest["low"])
+	def reset(self):
+		self._highs = RollingExtrema(self._period,track_min=False)
+		self._lows = RollingExtrema(self._period,track_max=False)
+
+		self._raw_stochastic =DataBuffer(max_size=120)
+		self._sma = SimpleMovingAverage(self._sma_period,
+										buffer_size=self._sma_period)
+
+
+	def horizon(self)->int:
+		"""%D averages signal_period values of %K, which each span period
+		candles."""
+		return self._period + self._sma_period - 1
+
+
+	def next_value(self,candles:CandleStore)->float:
+		close = candles.latest("close")
+		self._highs.push(candles.latest("high"))
+		self._lows.push(candles.latest("low"))
 
 		if len(candles) < self._period:
 			return self._indicator_buffer.get(-1)
 
-		lowest_low = np.min(self._lows.get_all())
-		highest_high = np.max(self._highs.get_all())
+		lowest_low = self._lows.minimum()
+		highest_high = self._highs.maximum()
 
-		stochastic = (latest["close"]-lowest_low)/(highest_high-lowest_low)*100
+		stochastic = (close-lowest_low)/(highest_high-lowest_low)*100
 
 		self._raw_stochastic.push(stochastic)
-		percentD = self._sma.next_value(self._raw_stochastic.get_all())
+		percentD = self._sma.next_value(
+			self._raw_stochastic.window(self._sma_period))
 
 		self._indicator_buffer.push(percentD)
 		return percentD
 
 	
-	def make_decision(self)->str:
+	def make_decision(self)->Decision:
+		return self.decide(self._buyt,self._sellt)
+
+
+	def decide(self,buy_threshold:float,sell_threshold:float)->Decision:
+		"""Makes the decision against the given thresholds instead of the
+		ones the indicator was built with."""
 		latest_value = self._indicator_buffer.get(-1)
 
-		if latest_value <= self._buyt:
-			return "BUY"
-		if latest_value >= self._sellt:
-			return "SELL"
-		return "HOLD"
+		if latest_value <= buy_threshold:
+			return Decision.BUY
+		if latest_value >= sell_threshold:
+			return Decision.SELL
+		return Decision.HOLD
 
 		
 	def __str__(self):
@@ -0,0 +1,141 @@
+from __future__ import annotations
+from typing import Dict,List
+from time import perf_counter_ns
+
+# Each power of two is split into 2**sub_bucket_bits buckets, so recorded
+# values are kept to within about 3% of their true value.
+sub_bucket_bits = 5
+reported_percentiles = {"p50":50.0,"p99":99.0,"p999":99.9}
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """HDR style histogram of nanosecond latencies. Values are counted in
+        log-linear buckets: exact below 2**sub_bucket_bits and with a fixed
+        relative precision above, so recording is a few integer operations
+        and the memory used does not grow with the number of values."""
+        self._sub_buckets = 1 << sub_bucket_bits
+        self._counts = [0]*(self._sub_buckets*2)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+
+    def _index(self,value:int)->int:
+        if value < self._sub_buckets:
+            return value
+        shift = value.bit_length() - sub_bucket_bits - 1
+        return (shift+1)*self._sub_buckets + (value >> shift) - self._sub_buckets
+
+
+    def _value(self,index:int)->int:
+        """The middle of the values counted in a bucket."""
+        if index < self._sub_buckets*2:
+            return index
+        shift = index // self._sub_buckets - 1
+        lowest = (index % self._sub_buckets + self._sub_buckets) << shift
+        return lowest + (1 << shift)//2
+
+
+    def record(self,value:int):
+        """Counts one latency in nanoseconds."""
+        if value < 0:
+            value = 0
+        index = self._index(value)
+        counts = self._counts
+        if index >= len(counts):
+            counts.extend([0]*(index+1-len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+
+    def percentile(self,percent:float)->int:
+        """Returns the latency at or below which percent of values fall."""
+        if self.count == 0:
+            return 0
+        rank = max(1,-(-self.count*percent // 100))
+        seen = 0
+        for index,count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._value(index),self.max)
+        return self.max
+
+
+    def merge(self,other:LatencyHistogram):
+        """Adds the counts of another histogram to this one."""
+        if len(other._counts) > len(self._counts):
+            self._counts.extend([0]*(len(other._counts)-len(self._counts)))
+        for index,count in enumerate(other._counts):
+            self._counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max,other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min,other.min)
+
+
+    def reset(self):
+        self.__init__()
+
+
+    def snapshot(self)->Dict:
+        """Count, mean, extremes and reported_percentiles in nanoseconds."""
+        snapshot = {"count":self.count,
+                    "min":self.min or 0,
+                    "mean":self.total / self.count if self.count else 0.0,
+                    "max":self.max}
+        for name,percent in reported_percentiles.items():
+            snapshot[name] = self.percentile(percent)
+        return snapshot
+
+
+class LatencyRecorder:
+    def __init__(self,stages:List[str]=()):
+        """A latency histogram per named stage of the hot path.
+        Parameters:
+            stages (List[str]): Stages to report even before they are seen."""
+        self.histograms = {stage:LatencyHistogram() for stage in stages}
+
+
+    def record(self,stage:str,nanoseconds:int):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(nanoseconds)
+
+
+    def since(self,stage:str,start:int)->int:
+        """Records the time elapsed from a perf_counter_ns start and returns
+        the current perf_counter_ns for timing the next stage from."""
+        now = perf_counter_ns()
+        self.record(stage,now-start)
+        return now
+
+
+    def snapshot(self)->Dict[str,Dict]:
+        """The snapshot of every stage's histogram, for exporters."""
+        return {stage:histogram.snapshot()
+                for stage,histogram in self.histograms.items()}
+
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+
+    def dump(self)->str:
+        """A table of the stage percentiles in microseconds."""
+        columns = ["count","mean"] + list(reported_percentiles) + ["max"]
+        lines = [F"{'stage':>20}" + "".join(F"{c:>12}" for c in columns)]
+        for stage,snapshot in self.snapshot().items():
+            values = [F"{snapshot['count']:>12}"]
+            values += [F"{snapshot[c]/1e3:>12.1f}" for c in columns[1:]]
+            lines.append(F"{stage:>20}" + "".join(values))
+        return "\n".join(lines)
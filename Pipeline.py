@@ -0,0 +1,209 @@
+from __future__ import annotations
+from typing import Any,Callable,Dict,Awaitable
+from collections import OrderedDict,deque
+from time import perf_counter_ns
+import asyncio
+
+queue_policies = ("block","drop_oldest","coalesce")
+
+
+class StageQueue:
+    def __init__(self,
+                 name:str,
+                 max_size:int=1024,
+                 policy:str="block",
+                 key:Callable[[Any],Any]=None):
+        """Bounded queue between two pipeline stages. What happens when a
+        producer puts into a full queue depends on the policy:
+            block: The producer waits for the consumer to make room.
+            drop_oldest: The oldest waiting item is dropped for the new one.
+            coalesce: A waiting item with the same key as the new one is
+                replaced in place, so the consumer only sees the latest of
+                each key. Otherwise the oldest waiting item is dropped.
+        Only a blocking queue ever makes the producer wait.
+        Parameters:
+            name (str): The name metrics are reported under.
+            max_size (int): The number of items which can wait.
+            policy (str): One of queue_policies.
+            key (Callable): Gives the coalescing key of an item, by default
+                every item has the same key."""
+        if policy not in queue_policies:
+            raise ValueError(F"Unknown queue policy {policy}, "
+                             F"expected one of {queue_policies}.")
+        self.name = name
+        self.policy = policy
+        self._max_size = max(1,max_size)
+        self._key = key if key is not None else (lambda item: None)
+        self._items = OrderedDict() if policy == "coalesce" else deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+
+    def depth(self)->int:
+        return len(self._items)
+
+
+    def put_nowait(self,item:Any)->bool:
+        """Adds an item without waiting, applying the drop or coalesce
+        policy when the queue is full. A full blocking queue refuses the item.
+        Returns whether the item was queued."""
+        if self.policy == "coalesce":
+            key = self._key(item)
+            if key in self._items:
+                self._items[key] = item
+                self.coalesced += 1
+                self.put_count += 1
+                return True
+            if len(self._items) >= self._max_size:
+                self._items.popitem(last=False)
+                self.dropped += 1
+            self._items[key] = item
+        else:
+            if len(self._items) >= self._max_size:
+                if self.policy == "block":
+                    return False
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+
+        self.put_count += 1
+        self.max_depth = max(self.max_depth,len(self._items))
+        self._readable.set()
+        if len(self._items) >= self._max_size:
+            self._writable.clear()
+        return True
+
+
+    async def put(self,item:Any):
+        """Adds an item, waiting for room only if the queue blocks."""
+        while not self.put_nowait(item):
+            await self._writable.wait()
+
+
+    async def get(self)->Any:
+        """Takes the oldest waiting item, waiting for one if empty."""
+        while not self._items:
+            self._readable.clear()
+            await self._readable.wait()
+
+        if self.policy == "coalesce":
+            _,item = self._items.popitem(last=False)
+        else:
+            item = self._items.popleft()
+        self.get_count += 1
+        self._writable.set()
+        return item
+
+
+    def metrics(self)->Dict:
+        return {"depth":len(self._items),
+                "max_depth":self.max_depth,
+                "put":self.put_count,
+                "taken":self.get_count,
+                "dropped":self.dropped,
+                "coalesced":self.coalesced}
+
+
+class Stage:
+    def __init__(self,
+                 name:str,
+                 inbox:StageQueue,
+                 handler:Callable[[Any],Awaitable]):
+        """A pipeline stage which takes items from its inbox one at a time and
+        awaits the handler on each. Handlers put their results into the
+        inboxes of the following stages themselves.
+        Parameters:
+            name (str): The name metrics are reported under.
+            inbox (StageQueue): Where the stage takes its items from.
+            handler (Callable): Coroutine function processing one item."""
+        self.name = name
+        self.inbox = inbox
+        self._handler = handler
+        self.processed = 0
+        self.busy_ns = 0
+        self.busy = False
+
+
+    async def run(self):
+        while True:
+            item = await self.inbox.get()
+            self.busy = True
+            start = perf_counter_ns()
+            try:
+                await self._handler(item)
+            finally:
+                self.busy = False
+            self.busy_ns += perf_counter_ns() - start
+            self.processed += 1
+            # Hand control back so a stage with a backlog cannot keep the
+            # receiver and the other stages waiting.
+            await asyncio.sleep(0)
+
+
+    def metrics(self)->Dict:
+        metrics = self.inbox.metrics()
+        metrics["processed"] = self.processed
+        metrics["busy_seconds"] = self.busy_ns / 1e9
+        return metrics
+
+
+class Pipeline:
+    def __init__(self):
+        """Queues and stages making up a pipeline, kept together so they can
+        be run and report their metrics as one."""
+        self.queues = {}
+        self.stages = {}
+
+
+    def queue(self,name:str,**kwargs)->StageQueue:
+        """Creates a queue, see StageQueue for the arguments."""
+        self.queues[name] = StageQueue(name,**kwargs)
+        return self.queues[name]
+
+
+    def stage(self,name:str,inbox:StageQueue,handler:Callable)->Stage:
+        self.stages[name] = Stage(name,inbox,handler)
+        return self.stages[name]
+
+
+    def metrics(self)->Dict[str,Dict]:
+        """Queue depth, drop and throughput counters by stage name. Queues
+        without a stage consuming them are reported under their own name."""
+        metrics = {name:stage.metrics() for name,stage in self.stages.items()}
+        consumed = {id(stage.inbox) for stage in self.stages.values()}
+        for name,queue in self.queues.items():
+            if id(queue) not in consumed:
+                metrics[name] = queue.metrics()
+        return metrics
+
+
+    async def drain(self,poll:float=0.001):
+        """Waits until every queue is empty and no stage is busy."""
+        while any(q.depth() for q in self.queues.values())\
+                or any(stage.busy for stage in self.stages.values()):
+            await asyncio.sleep(poll)
+
+
+    async def run(self,*sources:Awaitable):
+        """Runs every stage along with the given source coroutines, such as
+        the socket receiver. If any of them fails the rest are cancelled and
+        the error is raised."""
+        tasks = [asyncio.ensure_future(source) for source in sources]
+        tasks += [asyncio.ensure_future(stage.run())
+                  for stage in self.stages.values()]
+        try:
+            done,_ = await asyncio.wait(tasks,
+                                        return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks,return_exceptions=True)
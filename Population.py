@@ -0,0 +1,296 @@
+from __future__ import annotations
+from typing import List,Dict,Union,Tuple
+from concurrent.futures import ProcessPoolExecutor
+import json
+import pandas as pd
+import numpy as np
+
+from Backtest import resolve_tree,parameter_key,split_parameters
+from DataStructures.CompiledTree import CompiledTree
+from Decision import Decision,decision_dtype
+from RawIndicators.GenerateDecisions import decision_rules
+from RawIndicators.SeriesCache import SeriesCache
+from SharedArrays import SharedArrays,attach_arrays,detach_arrays
+
+candle_columns = ["open","high","low","close","volume"]
+fitness_columns = ["final_balance","profit","trades","gain_trades","lose_trades"]
+
+# Shared arrays seen by the series and fitness tasks of this process.
+_worker = {}
+
+
+def simulate_trades(decisions:np.ndarray,
+                    asks:np.ndarray,
+                    bids:np.ndarray=None,
+                    starting_balance:float=100.0,
+                    commission:float=0.01)->Dict:
+    """Replays the simulated trading of Trader over a whole decision history.
+    Starting out of the market, a BUY after a SELL buys with the whole
+    balance at the ask and a SELL after a BUY sells every coin at the bid,
+    both paying the commission. The position only changes where the latest
+    BUY or SELL changes, so those candles are found with array operations
+    and only the trades themselves are stepped through. A position still open
+    at the end is not counted.
+    Parameters:
+        decisions (np.ndarray): The Decision code of every candle.
+        asks (np.ndarray): The price paid when buying on each candle.
+        bids (np.ndarray): The price received when selling, defaults to asks.
+        starting_balance (float): The balance traded with.
+        commission (float): The fraction of every trade lost to fees.
+    Returns a dict of the fitness_columns."""
+    if bids is None:
+        bids = asks
+    fee = 1 - commission
+
+    decisions = np.asarray(decisions)
+    acted = np.flatnonzero(decisions != Decision.HOLD)
+    actions = decisions[acted]
+    previous = np.empty_like(actions)
+    previous[:1] = Decision.SELL
+    previous[1:] = actions[:-1]
+    trades = acted[actions != previous]
+
+    sells = trades[1::2]
+    buys = trades[0::2][:sells.shape[0]]
+
+    balance = starting_balance
+    gain_trades = 0
+    lose_trades = 0
+    for ask,bid in zip(np.asarray(asks)[buys].tolist(),
+                       np.asarray(bids)[sells].tolist()):
+        coin_balance = (balance / ask)*fee
+        sold_balance = (coin_balance * bid)*fee
+        if balance > sold_balance:
+            lose_trades += 1
+        elif balance < sold_balance:
+            gain_trades += 1
+        balance = sold_balance
+
+    return {"final_balance": balance,
+            "profit": balance - starting_balance,
+            "trades": int(sells.shape[0]),
+            "gain_trades": gain_trades,
+            "lose_trades": lose_trades}
+
+
+def candle_bids(candles:pd.DataFrame,
+                ticker:Dict[str,np.ndarray])->np.ndarray:
+    """The best bid of the last tick of every candle, which is what Trader
+    sells at on the decision made as the candle closes.
+    Parameters:
+        candles (pd.DataFrame): Candles as built by candles_from_ticker.
+        ticker (Dict[str,np.ndarray]): The ticker the candles were built from.
+    Returns the sell price of every candle."""
+    last_ticks = candles["index"].to_numpy() + candles["elements"].to_numpy()-1
+    return np.asarray(ticker["best_bid"],dtype=np.float64)[last_ticks]
+
+
+def _structure(tree:Union[str,Dict,CompiledTree])->CompiledTree:
+    if isinstance(tree,CompiledTree):
+        return tree
+    if isinstance(tree,str):
+        tree = json.loads(tree)
+    return CompiledTree.from_dict(tree)
+
+
+class _Batch:
+    def __init__(self):
+        """Trees evaluated together, with a row of the decision table for
+        every distinct node decision among them and the rows grouped by the
+        series they are decided from."""
+        self.rows = {}
+        self.series = {}
+        self.trees = []
+
+
+    def add(self,tree:CompiledTree,keys:List[Tuple]):
+        tree_rows = []
+        for key,(name,parameters) in zip(keys,
+                                         zip(tree.names,tree.parameters)):
+            if key not in self.rows:
+                self.rows[key] = len(self.rows)
+                series_parameters,rule_parameters =\
+                    split_parameters(parameters)
+                series_key = parameter_key(name,series_parameters)
+                if series_key not in self.series:
+                    self.series[series_key] = (name,series_parameters,[])
+                self.series[series_key][2].append(
+                    (self.rows[key],rule_parameters))
+            tree_rows.append(self.rows[key])
+        self.trees.append((tree,np.array(tree_rows,dtype=np.intp)))
+
+
+def _batches(compiled:List[CompiledTree],max_rows:int)->List[_Batch]:
+    """Groups consecutive trees so the distinct node decisions of a batch fit
+    in max_rows rows. A tree needing more rows is a batch on its own."""
+    batches = []
+    batch = _Batch()
+    for tree in compiled:
+        keys = [parameter_key(n,p) for n,p in zip(tree.names,tree.parameters)]
+        new_rows = len(set(keys).difference(batch.rows))
+        if batch.trees and len(batch.rows) + new_rows > max_rows:
+            batches.append(batch)
+            batch = _Batch()
+        batch.add(tree,keys)
+    if batch.trees:
+        batches.append(batch)
+    return batches
+
+
+def _initialize_worker(candle_descriptor:Dict,cache_directory:str=None):
+    """Maps the shared candles into a worker process and opens its series
+    cache."""
+    _worker["cache"] = SeriesCache(cache_directory)
+    _worker["candles_descriptor"] = candle_descriptor
+    _worker["candles"] = pd.DataFrame(attach_arrays(candle_descriptor),
+                                      copy=False)
+
+
+def _codes(descriptor:Dict)->np.ndarray:
+    """The shared decision table of the current batch. The table of the
+    previous batch is unmapped when a new one is first used."""
+    current = _worker.get("codes_descriptor")
+    if current != descriptor:
+        _worker.pop("codes",None)
+        if current is not None:
+            detach_arrays(current)
+        _worker["codes"] = attach_arrays(descriptor,writeable=True)["codes"]
+        _worker["codes_descriptor"] = descriptor
+    return _worker["codes"]
+
+
+def _release_worker():
+    """Drops every view and unmaps the shared arrays of this process."""
+    descriptors = [_worker.get("codes_descriptor"),
+                   _worker.get("candles_descriptor")]
+    _worker.clear()
+    for descriptor in descriptors:
+        if descriptor is not None:
+            detach_arrays(descriptor)
+
+
+def _series_task(task:Tuple)->int:
+    """Computes one indicator series and writes the decisions of every rule
+    applied to it into their rows of the shared table."""
+    descriptor,name,series_parameters,rows = task
+    codes = _codes(descriptor)
+    series_function,rule = decision_rules[name]
+    series = _worker["cache"].call(series_function,
+                                   _worker["candles"],
+                                   **series_parameters)
+    for row,rule_parameters in rows:
+        codes[row] = rule(series,**rule_parameters)
+    return len(rows)
+
+
+def _fitness_task(task:Tuple)->List[Dict]:
+    """Resolves a chunk of trees against the shared table and trades them."""
+    descriptor,trees,warmup,starting_balance,commission = task
+    codes = _codes(descriptor)
+    candles = _worker["candles"]
+    closes = candles["close"].to_numpy()
+    bids = candles["bid"].to_numpy() if "bid" in candles else None
+
+    results = []
+    for tree,rows in trees:
+        decisions = resolve_tree(tree,codes[rows])
+        decisions[:warmup] = Decision.HOLD
+        results.append(simulate_trades(decisions,
+                                       closes,
+                                       bids,
+                                       starting_balance=starting_balance,
+                                       commission=commission))
+    return results
+
+
+def evaluate_population(trees:List[Union[str,Dict,CompiledTree]],
+                        candles:pd.DataFrame,
+                        processes:int=None,
+                        starting_balance:float=100.0,
+                        commission:float=0.01,
+                        warmup:int=0,
+                        chunk_size:int=16,
+                        max_table_bytes:int=2**30,
+                        cache_directory:str=None,
+                        bids:np.ndarray=None)->pd.DataFrame:
+    """Scores a whole population of trees over a candle history. Every
+    distinct indicator series used by the population is computed once, and
+    every distinct node decision once, into a shared int8 table with a row
+    per (indicator, parameters). Each tree is then resolved from its rows of
+    the table and traded with simulate_trades, buying at the closes and
+    selling at bids, as BacktestRunner does. Both stages run
+    on a process pool whose workers read the candles and the table from
+    shared memory rather than receiving copies. Populations whose table would
+    exceed max_table_bytes are evaluated in batches of trees. Series are
+    looked up in a SeriesCache per worker, so a series shared across batches
+    is usually computed once, and with a cache_directory series computed by
+    earlier generations or other workers are read back from disk.
+    Parameters:
+        trees (List): Serialized trees, as json strings or parsed dicts, or
+            compiled trees.
+        candles (pd.DataFrame): Candles as built by candles_from_ticker.
+        processes (int): Worker processes, 1 evaluates in this process and
+            None uses one per cpu.
+        starting_balance (float): The balance every tree trades with.
+        commission (float): The fraction of every trade lost to fees.
+        warmup (int): Candles at the start on which no trades are made.
+        chunk_size (int): Trees resolved per fitness task.
+        max_table_bytes (int): Size limit of the decision table.
+        cache_directory (str): Directory of the series cache shared by the
+            workers and later calls, None keeps series in memory only.
+        bids (np.ndarray): The sell price of every candle, e.g. from
+            candle_bids, defaults to the closes.
+    Returns a dataframe of the fitness_columns with a row per tree."""
+    compiled = [_structure(tree) for tree in trees]
+    size = candles.shape[0]
+    batches = _batches(compiled,max(1,max_table_bytes // max(size,1)))
+
+    arrays = {c:np.asarray(candles[c],dtype=np.float64)
+              for c in candle_columns}
+    if bids is not None:
+        arrays["bid"] = np.asarray(bids,dtype=np.float64)
+    results = []
+    with SharedArrays(arrays) as shared_candles:
+        pool = None
+        if processes == 1:
+            _initialize_worker(shared_candles.descriptor(),cache_directory)
+            run = map
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_initialize_worker,
+                initargs=(shared_candles.descriptor(),cache_directory))
+            run = pool.map
+
+        try:
+            for batch in batches:
+                with SharedArrays() as shared_codes:
+                    shared_codes.allocate("codes",
+                                          (len(batch.rows),size),
+                                          decision_dtype)
+                    descriptor = shared_codes.descriptor()
+
+                    series_tasks = [(descriptor,)+task
+                                    for task in batch.series.values()]
+                    list(run(_series_task,series_tasks))
+
+                    fitness_tasks = [(descriptor,
+                                      batch.trees[i:i+chunk_size],
+                                      warmup,
+                                      starting_balance,
+                                      commission)
+                                     for i in range(0,len(batch.trees),
+                                                    chunk_size)]
+                    for chunk in run(_fitness_task,fitness_tasks):
+                        results.extend(chunk)
+
+                    if pool is None:
+                        _worker.pop("codes",None)
+                        detach_arrays(_worker.pop("codes_descriptor"))
+        finally:
+            if pool is None:
+                _release_worker()
+            else:
+                pool.shutdown()
+
+    return pd.DataFrame(results,columns=fitness_columns)
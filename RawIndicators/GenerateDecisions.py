@@ -1,133 +1,217 @@
 from __future__ import annotations
-from typing import List
+from typing import Tuple,Any
 import pandas as pd
 import numpy as np
 
 from .RawIndicators import (
     balance_of_power,
-    derivative,
     relative_strength_index,
     money_flow_index,
     chaikin_oscillator,
     simple_moving_average,
     array_shift,
+    stochastic_oscillator,
     moving_average_convergance_divergance)
+from Decision import Decision,decision_dtype
+
+# Each generator below is split into a series function which does the work
+# over the candles and a rule turning the series into decisions. Callers
+# evaluating many parameter sets can then share a series between rules that
+# only differ in their thresholds. The rules decide exactly as the decide
+# method of the matching Indicators class does on one value, buying first
+# when both thresholds are met. Decisions are int8 Decision codes, use
+# Decision.decision_strings to get names for reporting.
+
+def _choose(condition:np.array,decision:Decision,otherwise:Any)->np.array:
+    """np.where which keeps decision codes int8."""
+    return np.where(condition,
+                    decision_dtype(decision),
+                    np.asarray(otherwise,dtype=decision_dtype))
+
+
+def bop_series(candles:pd.DataFrame,
+               period:int=18,
+               derivative_resolution:int=6)->Tuple[np.array,np.array]:
+    """Returns the balance of power and its derivative. The derivative is
+    taken as the live Derivative indicator takes it, over the last
+    derivative_resolution values, whose ends are derivative_resolution-1
+    candles apart."""
+    bop = np.asarray(balance_of_power(candles,period),dtype=np.float64)
+
+    if derivative_resolution > 1:
+        bop_prime = (bop - array_shift(bop,derivative_resolution-1))\
+            / derivative_resolution
+    else:
+        bop_prime = np.zeros_like(bop)
+    bop_prime = np.where(np.isnan(bop_prime),0,bop_prime)
+    return bop,bop_prime
+
+
+def bop_rule(series:Tuple[np.array,np.array],
+             buy_threshold:float=-0.24,
+             sell_threshold:float=0.18)->np.array:
+    bop,bop_prime = series
+    decisions = _choose((bop_prime>0)&(bop>=sell_threshold),
+                        Decision.SELL,Decision.HOLD)
+    decisions = _choose((bop_prime<0)&(bop<=buy_threshold),
+                        Decision.BUY,decisions)
+    return decisions
+
+
+def threshold_rule(indicator:np.array,
+                   buy_threshold:float=30,
+                   sell_threshold:float=70)->np.array:
+    """Buy at or below the buy threshold and sell at or above the sell
+    threshold, with buying taking precedence."""
+    decisions = _choose(indicator>=sell_threshold,Decision.SELL,Decision.HOLD)
+    decisions = _choose(indicator<=buy_threshold,Decision.BUY,decisions)
+    return decisions
+
+
+def rsi_series(candles:pd.DataFrame,period:int=18)->np.array:
+    return relative_strength_index(candles,period)
+
+
+def mfi_series(candles:pd.DataFrame,period:int=18)->np.array:
+    return money_flow_index(candles,period)
+
+
+def crossing_rule(signal:np.array)->np.array:
+    """Buy when the signal moves from negative to positive and sell when it
+    moves from positive to negative."""
+    shifted = array_shift(signal,1)
+
+    decisions = _choose((signal > 0) & (shifted < 0),Decision.BUY,Decision.HOLD)
+    decisions = _choose((signal < 0) & (shifted > 0),Decision.SELL,decisions)
+    return decisions
+
+
+def chaikin_series(candles:pd.DataFrame,
+                   fast_period:int,
+                   slow_period:int,
+                   signal_period:int)->np.array:
+    """Returns the chaikin oscillator minus its simple moving average."""
+    chaikin = chaikin_oscillator(candles,slow_period,fast_period)
+    sma = simple_moving_average(chaikin,signal_period)
+    return chaikin - sma
+
+
+def macd_series(candles:pd.DataFrame,
+                fast_period:int,
+                slow_period:int,
+                signal_period:int)->np.array:
+    """Returns the MACD minus its signal line."""
+    macd,signal,indicator = moving_average_convergance_divergance(
+        data=candles["close"],
+        fast_window=fast_period,
+        slow_window=slow_period,
+        signal_window=signal_period)
+    return indicator
+
+
+def stochastic_series(candles:pd.DataFrame,
+                      period:int=14,
+                      signal_period:int=3)->np.array:
+    return stochastic_oscillator(candles,period,signal_period)
+
+
+def stochastic_rule(indicator:np.array,
+                    buy_threshold:float=20,
+                    sell_threshold:float=80)->np.array:
+    """The same inclusive thresholds as threshold_rule, with buying taking
+    precedence."""
+    return threshold_rule(indicator,buy_threshold,sell_threshold)
+
 
 def generate_bop_decisions(candles:pd.DataFrame,
                            buy_threshold:float=-0.24,
                            sell_threshold:float=0.18,
                            period:int=18,
-                           derivative_resolution:int=6)->List[str]:
+                           derivative_resolution:int=6)->np.array:
     """Generates a set of decisions based on the balance of power and its
     derivative which tells us whether we are increasing or decreasing. Note that
-    the buy and sell thresholds are different for different commodities and 
+    the buy and sell thresholds are different for different commodities and
     should be experimentally determined.
     Parameters:
         buy_threshold (float): The threshold at which to consider a buy signal
         sell_threshold (float): The threshold at which to consider a sell signal
-    Returns the list of decisions."""
-    bop = balance_of_power(candles,period)
-    
-    bop_prime = derivative(bop,derivative_resolution)
-    bop_prime = np.where(np.isnan(bop_prime),0,bop_prime)
-
-    decisions = np.where((bop_prime<0)&(bop<=buy_threshold),"BUY",'HOLD')
-    decisions = np.where((bop_prime>0)&(bop>=sell_threshold),"SELL",decisions)
-    
-    return decisions
+    Returns the Decision code of every candle."""
+    series = bop_series(candles,period,derivative_resolution)
+    return bop_rule(series,buy_threshold,sell_threshold)
 
 
 def generate_rsi_decisions(candles:pd.DataFrame,
                            buy_threshold:float=30,
                            sell_threshold:float=70,
-                           period:int=18)->List[str]:
-    """Generates a set of decisions based on the relative strength index. Note 
-    that the buy and sell thresholds are different for different commodities and 
+                           period:int=18)->np.array:
+    """Generates a set of decisions based on the relative strength index. Note
+    that the buy and sell thresholds are different for different commodities and
     should be experimentally determined.
     Parameters:
         buy_threshold (float): The threshold at which to consider a buy signal
         sell_threshold (float): The threshold at which to consider a sell signal
-    Returns the list of decisions."""
-    rsi = relative_strength_index(candles,period)
-
-    decisions = np.where(rsi<=buy_threshold,"BUY",'HOLD')
-    decisions = np.where(rsi>=sell_threshold,"SELL",decisions)
-
-    return decisions
+    Returns the Decision code of every candle."""
+    rsi = rsi_series(candles,period)
+    return threshold_rule(rsi,buy_threshold,sell_threshold)
 
 
 def generate_mfi_decisions(candles:pd.DataFrame,
                            buy_threshold:float=30,
                            sell_threshold:float=70,
-                           period:int=18)->List[str]:
-    """Generates a set of decisions based on the money flow index. Note 
-    that the buy and sell thresholds are different for different commodities and 
+                           period:int=18)->np.array:
+    """Generates a set of decisions based on the money flow index. Note
+    that the buy and sell thresholds are different for different commodities and
     should be experimentally determined.
     Parameters:
         buy_threshold (float): The threshold at which to consider a buy signal
         sell_threshold (float): The threshold at which to consider a sell signal
-    Returns the list of decisions."""
-    mfi = money_flow_index(candles,period)
-
-    decisions = np.where(mfi<=buy_threshold,"BUY",'HOLD')
-    decisions = np.where(mfi>=sell_threshold,"SELL",decisions)
-
-    return decisions
+    Returns the Decision code of every candle."""
+    mfi = mfi_series(candles,period)
+    return threshold_rule(mfi,buy_threshold,sell_threshold)
 
 
 def generate_chaikin_decisions(candles:pd.DataFrame,
                                fast_period:int,
                                slow_period:int,
-                               signal_period:int)->List[str]:
+                               signal_period:int)->np.array:
     """Generates a set of decisions based on the chaikin oscillator subtracted
     from its simple moving average. When this measure moves from negative to
     positive its a buy signal, and from positive to negative a sell signal.
     We determine this move by shifting the signal back and comparing it with
     its older values.
-    Returns the list of decisions."""
-    chaikin = chaikin_oscillator(candles,slow_period,fast_period)
-    sma = simple_moving_average(chaikin,signal_period)
-    
-    signal = chaikin - sma
-    shifted = array_shift(signal,1)
-
-    decisions = np.where((signal > 0) & (shifted < 0),"BUY",'HOLD')
-    decisions = np.where((signal < 0) & (shifted > 0),"SELL",decisions)
-
-    return decisions
+    Returns the Decision code of every candle."""
+    signal = chaikin_series(candles,fast_period,slow_period,signal_period)
+    return crossing_rule(signal)
 
 
 def generate_macd_decisions(candles:pd.DataFrame,
                             fast_period:int,
                             slow_period:int,
-                            signal_period:int)->List[str]:
-    """Generates a set of decisions based on the MACD subtracted from its 
-    signal line. When this measure moves from negative to positive its a buy 
-    signal, and from positive to negative a sell signal.We determine this move 
+                            signal_period:int)->np.array:
+    """Generates a set of decisions based on the MACD subtracted from its
+    signal line. When this measure moves from negative to positive its a buy
+    signal, and from positive to negative a sell signal.We determine this move
     by shifting the signal back and comparing it with its older values
-    Returns the list of decisions."""
-    macd,signal,indicator = moving_average_convergance_divergance(
-        data=candles["close"],
-        fast_window=fast_period,
-        slow_window=slow_period,
-        signal_window=signal_period)
-
-    shifted = array_shift(indicator,1)
-
-    decisions = np.where((indicator > 0) & (shifted < 0),"BUY",'HOLD')
-    decisions = np.where((indicator < 0) & (shifted > 0),"SELL",decisions)
-
-    return decisions
+    Returns the Decision code of every candle."""
+    indicator = macd_series(candles,fast_period,slow_period,signal_period)
+    return crossing_rule(indicator)
 
 
 def generate_stochastic_decisions(candles:pd.DataFrame,
                                   period:int=14,
                                   signal_period:int=3,
                                   buy_threshold:float=20,
-                                  sell_threshold:float=80):
-    indicator = stochastic_oscillator(candles,period,signal_period)
-
-    decisions = np.where(indicator > sell_threshold,"SELL",'HOLD')
-    decisions = np.where(indicator < buy_threshold,"BUY",decisions)
-
-    return decisions
+                                  sell_threshold:float=80)->np.array:
+    indicator = stochastic_series(candles,period,signal_period)
+    return stochastic_rule(indicator,buy_threshold,sell_threshold)
+
+
+# Series function and decision rule of every tree indicator by name.
+decision_rules = {
+    "bop": (bop_series,bop_rule),
+    "rsi": (rsi_series,threshold_rule),
+    "chaikin": (chaikin_series,crossing_rule),
+    "mfi": (mfi_series,threshold_rule),
+    "macd": (macd_series,crossing_rule),
+    "stochastic": (stochastic_series,stochastic_rule),
+}
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from DataStructures.RollingExtrema import rolling_minimum,rolling_maximum
+
 def derivative(arr:np.array,resolution:int)->np.array:
     """Computes a dumb derivative by taking the slope between each set of 
     values in the input array. The resolution specifies the interval of the
@@ -66,15 +68,29 @@ def exponential_moving_average(
     alpha = (smoothing / (1+period))
     # If nans, figure out the index of all the nans and offset by that.
     offset = np.sum(np.where(np.isfinite(data),0,1))
-    prices = data[offset:]
+    values = np.asarray(data,dtype=np.float64)
+    prices = values[offset:]
 
-    seed_value = np.mean(prices[:period])
-    ema = np.array([*np.repeat(np.nan,period-1+offset),seed_value])
+    closes = prices[period:]
+    if isinstance(data,pd.Series):
+        # Series were always indexed by label here, so with a default index
+        # the closes come from the start of the data instead of past offset.
+        closes = values[period:prices.shape[0]]
 
-    for i in range(period,prices.shape[0]):
-        prev_ema = ema[-1]
-        close = prices[i]
-        ema = np.append(ema,(close - prev_ema) * alpha + prev_ema)
+    seed_value = np.mean(prices[:period])
+    ema = np.empty(offset + max(period,prices.shape[0]))
+    ema[:period-1+offset] = np.nan
+    ema[period-1+offset] = seed_value
+
+    # The recursion runs on python floats which round exactly like float64,
+    # collected in a list since storing single items into numpy is slow.
+    prev_ema = float(seed_value)
+    values = []
+    append = values.append
+    for close in closes.tolist():
+        prev_ema = (close - prev_ema) * alpha + prev_ema
+        append(prev_ema)
+    ema[period+offset:period+offset+len(values)] = values
     return ema
 
 
@@ -119,10 +135,15 @@ def kaufman_adaptive_moving_average(data:np.array,
     
     smoothing_constant = np.square(er * (fast_sc - slow_sc) + slow_sc)
 
-    kama = simple_moving_average(data[:er_period],er_period)
-    for i in range(er_period,data.shape[0]):
-        new_value = kama[-1] + smoothing_constant[i]*(data[i]-kama[-1])
-        kama = np.append(kama,new_value)
+    kama = np.empty(max(er_period,data.shape[0]))
+    kama[:er_period] = simple_moving_average(data[:er_period],er_period)
+
+    prev_kama = float(kama[er_period-1])
+    constants = smoothing_constant[er_period:].tolist()
+    values = data[er_period:].tolist()
+    for i,(constant,value) in enumerate(zip(constants,values),start=er_period):
+        prev_kama = prev_kama + constant*(value-prev_kama)
+        kama[i] = prev_kama
     
     return kama
 
@@ -197,7 +218,8 @@ def relative_strength_index(data:pd.DataFrame,period:int)->np.array:
     Evaluates overbought and oversold conditions. Values over 70 are overbought
     and values below 30 are oversold. Implemented following:
     https://www.investopedia.com/terms/r/rsi.asp"""
-    price_changes = np.diff(data["close"])
+    closes = np.asarray(data["close"],dtype=np.float64)
+    price_changes = np.diff(closes)
 
     gains = np.where(price_changes>0,price_changes,0.0)
     gains = np.insert(gains,0,0)
@@ -207,37 +229,55 @@ def relative_strength_index(data:pd.DataFrame,period:int)->np.array:
 
     prev_gain = gains[:period].mean()
     prev_losses = losses[:period].mean()
-    rs = np.array([*np.repeat(np.nan,period-1),prev_gain/prev_losses])
-
-    index = period
-    while index < len(data.index):
-        prev_gain = (prev_gain*(period-1) + gains[index])/period
-        
-        prev_losses = (prev_losses*(period-1) + losses[index])/period
-        prev_losses = np.where(prev_losses==0,1,prev_losses)
-        
-        rs = np.append(rs,prev_gain/prev_losses)
-        index += 1
+    rs = np.empty(max(period,closes.shape[0]))
+    rs[:period-1] = np.nan
+    rs[period-1] = prev_gain/prev_losses
+
+    # Wilder smoothing on python floats, which round exactly like float64.
+    # Each average is its own tight loop and the ratio is taken afterwards.
+    average_gains = _wilder_smoothing(float(prev_gain),gains[period:],period)
+    average_losses = _wilder_smoothing(float(prev_losses),losses[period:],
+                                       period,reset_zero=True)
+    rs[period:] = np.divide(average_gains,average_losses)
 
     return 100 - (100/(1+rs))
 
 
+def _wilder_smoothing(seed:float,
+                      values:np.array,
+                      period:int,
+                      reset_zero:bool=False)->list:
+    """Runs the Wilder average (prev*(period-1) + value)/period over values
+    starting from seed. With reset_zero an average reaching zero restarts
+    from 1 like the RSI loss average does."""
+    lags = float(period - 1)
+    period = float(period)
+    average = seed
+    output = []
+    append = output.append
+    if reset_zero:
+        for value in values.tolist():
+            average = (average*lags + value)/period
+            if average == 0:
+                average = 1.0
+            append(average)
+    else:
+        for value in values.tolist():
+            average = (average*lags + value)/period
+            append(average)
+    return output
+
+
 def stochastic_oscillator(data:pd.DataFrame,period:int,signal_period:int)->np.array:
     """Calculates the stochastic oscillator data which is a momentum indicator
     telling us whether a stock is overbought or oversold. Overbought threshold
     is set to 80 and oversold is set at 20. Usually used with the 3 period 
     moving average of itself. Implementation follows:
     https://www.investopedia.com/terms/s/stochasticoscillator.asp"""
-    
-    result = np.repeat(np.nan,period-1)
-    index = period
-    while index < data.shape[0]+1:
-        temp = data.iloc[(index-period):index,:]
-        high = np.max(temp["high"])
-        low = np.min(temp["low"])
-        close = temp["close"].iloc[-1]
-        result = np.append(result,((close-low)/(high-low)*100))
-        index += 1
+    high = rolling_maximum(data["high"],period)
+    low = rolling_minimum(data["low"],period)
+    close = np.asarray(data["close"],dtype=np.float64)
+    result = (close-low)/(high-low)*100
     
     return simple_moving_average(result,signal_period)
 
@@ -248,26 +288,26 @@ def ulcer_index(data:pd.DataFrame,period:int)->np.array:
     levels this means that a return to that price will take a long time.
     Normal levels can be ascertained from using a very long running SMA.
     Implemented from: https://www.investopedia.com/terms/u/ulcerindex.asp"""
-    index = 0
-    percent_drawdown_sqr = np.array([],dtype=np.float64)
-    while index < data.shape[0]:
-        temp = data.iloc[max(0,index-period):index,:]["close"]
-        
-        period_max_close = np.max(temp)
-        close = data.iloc[index,:]["close"]
-
-        drawdown = ((close - period_max_close) - period_max_close) * 100
-        
-        percent_drawdown_sqr = np.append(
-            percent_drawdown_sqr,np.square(drawdown))
-        index += 1
-
-    index = period
-    ulcer_index = np.repeat(np.nan,period-1)
-    while index < data.shape[0]+1:
-        temp = percent_drawdown_sqr[index-period:index]
-        ulcer_index = np.append(ulcer_index,np.sqrt(np.mean(temp)))
-        index += 1
+    closes = np.asarray(data["close"],dtype=np.float64)
+    size = closes.shape[0]
+
+    # Highest close of the period before each candle, or of every earlier
+    # candle while there are fewer than period of them.
+    period_max_close = np.empty(size)
+    period_max_close[0] = np.nan
+    leading = min(period,size-1)
+    period_max_close[1:leading+1] = np.maximum.accumulate(closes[:leading])
+    period_max_close[period+1:] = rolling_maximum(closes,period)[period:-1]
+
+    drawdown = ((closes - period_max_close) - period_max_close) * 100
+    percent_drawdown_sqr = np.square(drawdown)
+
+    ulcer_index = np.empty(max(period-1,size))
+    ulcer_index[:period-1] = np.nan
+    if size >= period:
+        views = np.lib.stride_tricks.sliding_window_view(
+            percent_drawdown_sqr,period)
+        ulcer_index[period-1:] = np.sqrt(np.mean(views,axis=1))
     
     return ulcer_index
 
@@ -313,28 +353,29 @@ def average_true_range(data:pd.DataFrame,period:int)->np.array:
     
     Parameters:
         period (int): The smoothing factor for our ATR."""
+    highs = np.asarray(data["high"],dtype=np.float64)
+    lows = np.asarray(data["low"],dtype=np.float64)
+    prev_closes = np.asarray(data["close"],dtype=np.float64)[:-1]
+
     # First TR is jsut the high - the low
-    temp = data.iloc[0,:]
-    true_rating = np.array([temp["high"]-temp["low"]],dtype=np.float64)
+    true_rating = highs - lows
+    true_rating[1:] = np.maximum(
+        np.maximum(true_rating[1:],np.abs(highs[1:]-prev_closes)),
+        np.abs(lows[1:]-prev_closes))
 
-    for i in range(1,len(data.index)):
-        temp = data.iloc[i,:]
-        prev = data.iloc[i-1,:]
-        trA = temp["high"]-temp["low"]
-        trB = abs(temp["high"]-prev["close"])
-        trC = abs(temp["low"]-prev["close"])
-        true_rating = np.append(true_rating,np.max([trA,trB,trC]))
+    output = np.empty(max(period,true_rating.shape[0]))
+    output[:period-1] = np.nan
 
     # First ATR is mean of first 14 periods
-    atr = np.array([true_rating[:period].mean()])
+    output[period-1] = true_rating[:period].mean()
     
-    prev_atr = atr[-1]
-    for tr in true_rating[period:]:
-        atr = np.append(atr,((prev_atr*(period-1))+tr)/period)
-        prev_atr = atr[-1]
+    prev_atr = float(output[period-1])
+    ranges = true_rating[period:].tolist()
+    for i,tr in enumerate(ranges,start=period):
+        prev_atr = ((prev_atr*(period-1))+tr)/period
+        output[i] = prev_atr
 
-    output = np.repeat(np.nan,period-1)
-    return np.append(output,atr)
+    return output
 
 
 def money_flow_index(data:pd.DataFrame,period:int)->np.array:
@@ -0,0 +1,233 @@
+from __future__ import annotations
+from typing import Any,Callable,Tuple
+from collections import OrderedDict
+import hashlib
+import weakref
+import os
+import pandas as pd
+import numpy as np
+
+
+def _index_digest(digest,index:pd.Index):
+    """Hashes every label of an index along with its type and dtype."""
+    labels = pd.util.hash_pandas_object(index,index=False).to_numpy()
+    digest.update(F"{type(index).__name__}:{index.dtype}".encode())
+    digest.update(np.ascontiguousarray(labels).data)
+
+
+def data_digest(data:Any)->str:
+    """Content hash of an indicator input. Every column of a dataframe is
+    hashed with its name and dtype, along with every label of the index, so
+    any change to the candles, or passing a series instead of an array, gives
+    a different digest."""
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(data,pd.DataFrame):
+        columns = [(str(c),data[c]) for c in data.columns]
+        digest.update(b"frame")
+        _index_digest(digest,data.index)
+    elif isinstance(data,pd.Series):
+        columns = [("",data)]
+        digest.update(b"series")
+        _index_digest(digest,data.index)
+    else:
+        columns = [("",data)]
+        digest.update(b"array")
+
+    for name,column in columns:
+        values = np.ascontiguousarray(np.asarray(column))
+        digest.update(F"{name}:{values.dtype.str}:{values.shape}".encode())
+        digest.update(values.data)
+    return digest.hexdigest()
+
+
+def _nbytes(value:Tuple[np.ndarray])->int:
+    return sum(v.nbytes for v in value)
+
+
+def _read_only(value:Any)->Tuple[np.ndarray]:
+    """Cached values are tuples of read only arrays so callers sharing an
+    entry cannot change it under each other. Arrays which are views, e.g. of
+    the function's input, are copied first so the input stays writeable."""
+    values = value if isinstance(value,tuple) else (value,)
+    arrays = tuple(np.array(v) if not isinstance(v,np.ndarray)
+                   else (v if v.flags.owndata else v.copy())
+                   for v in values)
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+class SeriesCache:
+    def __init__(self,
+                 directory:str=None,
+                 memory_bytes:int=256*2**20,
+                 disk_bytes:int=8*2**30):
+        """Content addressed cache of indicator series. An entry is keyed by
+        a hash of the function's qualified name, a hash of its input data and
+        its other arguments, so recomputing the same series on the same
+        candles is a lookup. Recently used entries are kept in memory up to
+        memory_bytes. With a directory every entry is also written there as
+        .npy files, which are memory mapped when read back, and the least
+        recently used are deleted once the directory exceeds disk_bytes.
+        Several processes can share a directory. Inputs must not be modified
+        in place after being passed in, since their hashes are remembered.
+        Parameters:
+            directory (str): Where to keep entries on disk, None for memory only.
+            memory_bytes (int): Size limit of the in memory entries.
+            disk_bytes (int): Size limit of the directory."""
+        self._directory = directory
+        self._memory_bytes = memory_bytes
+        self._disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._digests = {}
+        self.hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory,exist_ok=True)
+
+
+    def _digest(self,data:Any)->str:
+        """Hashes each input once for as long as it is alive."""
+        entry = self._digests.get(id(data))
+        if entry is not None and entry[0]() is data:
+            return entry[1]
+
+        digest = data_digest(data)
+        key = id(data)
+        try:
+            reference = weakref.ref(data,lambda _: self._digests.pop(key,None))
+        except TypeError:
+            return digest
+        self._digests[key] = (reference,digest)
+        return digest
+
+
+    def key(self,function:Callable,data:Any,*args,**kwargs)->str:
+        """Returns the cache key of function(data,*args,**kwargs)."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(F"{function.__module__}.{function.__qualname__}".encode())
+        digest.update(self._digest(data).encode())
+        digest.update(repr(args).encode())
+        digest.update(repr(sorted(kwargs.items())).encode())
+        return digest.hexdigest()
+
+
+    def call(self,function:Callable,data:Any,*args,**kwargs)->Any:
+        """Returns function(data,*args,**kwargs), computing it only if it is
+        not cached. Results come back as read only numpy arrays, or a tuple
+        of them for functions returning several series."""
+        key = self.key(function,data,*args,**kwargs)
+        value = self._memory_get(key)
+        if value is None:
+            value = self._disk_get(key)
+            if value is None:
+                self.misses += 1
+                value = _read_only(function(data,*args,**kwargs))
+                self._disk_put(key,value)
+            else:
+                self.hits += 1
+            self._memory_put(key,value)
+        else:
+            self.hits += 1
+        return value if len(value) > 1 else value[0]
+
+
+    def wrap(self,function:Callable)->Callable:
+        """Returns function with every call going through the cache."""
+        def cached(data:Any,*args,**kwargs)->Any:
+            return self.call(function,data,*args,**kwargs)
+        cached.__name__ = function.__name__
+        cached.__doc__ = function.__doc__
+        return cached
+
+
+    def _memory_get(self,key:str)->Tuple[np.ndarray]:
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+
+    def _memory_put(self,key:str,value:Tuple[np.ndarray]):
+        self._memory[key] = value
+        self._memory_used += _nbytes(value)
+        while self._memory_used > self._memory_bytes and len(self._memory) > 1:
+            _,evicted = self._memory.popitem(last=False)
+            self._memory_used -= _nbytes(evicted)
+
+
+    def _path(self,key:str,stacked:bool)->str:
+        """Single series are stored as they are, several series of the same
+        shape are stacked into one array."""
+        suffix = "stack.npy" if stacked else "npy"
+        return os.path.join(self._directory,F"{key}.{suffix}")
+
+
+    def _disk_get(self,key:str)->Tuple[np.ndarray]:
+        if self._directory is None:
+            return None
+
+        for stacked in (False,True):
+            path = self._path(key,stacked)
+            try:
+                array = np.load(path,mmap_mode="r")
+                os.utime(path)
+            except (FileNotFoundError,ValueError):
+                # Missing, evicted or still being written by another process.
+                continue
+            return tuple(array) if stacked else (array,)
+        return None
+
+
+    def _disk_put(self,key:str,value:Tuple[np.ndarray]):
+        if self._directory is None:
+            return
+
+        stacked = len(value) > 1
+        if stacked:
+            if len({(v.shape,v.dtype) for v in value}) > 1:
+                return
+            array = np.stack(value)
+        else:
+            array = value[0]
+        if array.dtype == object:
+            return
+
+        path = self._path(key,stacked)
+        temporary = F"{path}.{os.getpid()}.tmp"
+        with open(temporary,"wb") as file:
+            np.save(file,array)
+        os.replace(temporary,path)
+        self._evict_disk()
+
+
+    def _evict_disk(self):
+        """Deletes the least recently used entries until the directory fits
+        in disk_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self._directory):
+            if not entry.name.endswith(".npy"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime,stat.st_size,entry.path))
+            total += stat.st_size
+
+        for used,size,path in sorted(entries):
+            if total <= self._disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+    def clear_memory(self):
+        self._memory.clear()
+        self._memory_used = 0
@@ -1,24 +1,167 @@
-from typing import Dict
+from typing import Dict,Callable,Any
+from collections import deque
+from time import time
+import asyncio
+import json
 
-def live_trade_report(state,ticker:Dict):
-    """Prints some useful statistics about how we are currently doing in our
-    trades."""
-    # Produce a live balance that gets updated every tick.
-    if state.coin_balance != 0.0:
-        temp = (state.coin_balance * float(ticker["best_bid"]))*state.fee
-        print(F"Appx Balance: {temp}, Coins: {state.coin_balance}")
-    else:
-        print(F"Current Balance: {state.current_balance},"\
-              F" Coins: {state.coin_balance}")
 
-    # Prints the baseline balance of holding long for comparison
+def set_long_baseline(state,ticker:Dict):
+    """Takes the baseline of holding long from the first ticker of a symbol,
+    later tickers leave it unchanged."""
     if state.first_price is None:
         state.first_price = float(ticker["best_ask"])
         state.initial_coin_balance =\
             (state.current_balance / state.first_price)*state.fee
+
+
+def trade_summary(state,ticker:Dict)->Dict:
+    """Returns the live balance of a symbol at the ticker's prices along with
+    the balance of having held long since the baseline, if one was taken.
+    Leaves the state unchanged."""
+    if state.coin_balance != 0.0:
+        balance = (state.coin_balance * float(ticker["best_bid"]))*state.fee
     else:
+        balance = state.current_balance
+
+    long = None
+    if state.first_price is not None:
         temp = (100.0 / state.first_price)*state.fee
         long = (temp * float(ticker["best_bid"]))*state.fee
 
-        print(F"Initial Coin Balance: {state.initial_coin_balance}")
-        print(F"Long Balance: {long}\n")
\ No newline at end of file
+    return {"balance":balance,
+            "coins":state.coin_balance,
+            "in_market":state.coin_balance != 0.0,
+            "initial_coin_balance":state.initial_coin_balance,
+            "long_balance":long,
+            "gain_trades":state.gain_trades,
+            "lose_trades":state.lose_trades,
+            "candle_elements":state.current_candle["elements"],
+            "candle_period":state.candle_period}
+
+
+def live_trade_report(state,ticker:Dict):
+    """Prints some useful statistics about how we are currently doing in our
+    trades."""
+    set_long_baseline(state,ticker)
+    summary = trade_summary(state,ticker)
+    if summary["in_market"]:
+        print(F"Appx Balance: {summary['balance']}, Coins: {summary['coins']}")
+    else:
+        print(F"Current Balance: {summary['balance']},"\
+              F" Coins: {summary['coins']}")
+
+    # Prints the baseline balance of holding long for comparison
+    if summary["long_balance"] is not None:
+        print(F"Initial Coin Balance: {summary['initial_coin_balance']}")
+        print(F"Long Balance: {summary['long_balance']}\n")
+
+
+class Reporter:
+    def __init__(self,
+                 interval:float=10.0,
+                 min_interval:float=1.0,
+                 json_output:bool=False,
+                 output:Callable[[str],Any]=print,
+                 max_events:int=4096):
+        """Reports on trading in the background so the hot path never formats
+        or writes anything. Ticks only replace the latest ticker kept for their
+        symbol and events such as trades and candle closes are queued as
+        plain tuples. A background task emits a summary of every symbol and
+        the events since the last one every interval seconds, or early when
+        an event arrives, but never more often than min_interval.
+        Parameters:
+            interval (float): Seconds between summaries without events.
+            min_interval (float): Fewest seconds between two summaries.
+            json_output (bool): Emit each summary as one line of json.
+            output (Callable): Where the summary text is written.
+            max_events (int): Events kept before the oldest are dropped."""
+        self._interval = interval
+        self._min_interval = min_interval
+        self._json_output = json_output
+        self._output = output
+        self._latest = {}
+        self._events = deque(maxlen=max_events)
+        self._wake = None
+        self.ticks = 0
+
+
+    def tick(self,state,ticker:Dict):
+        """Keeps the latest ticker of a symbol for the next summary, and takes
+        the long baseline from its first ticker."""
+        if state.first_price is None:
+            set_long_baseline(state,ticker)
+        self._latest[state.symbol] = (state,ticker)
+        self.ticks += 1
+
+
+    def event(self,kind:str,state,*values):
+        """Queues an event, such as a trade, for the next summary and has it
+        emitted as soon as the rate limit allows."""
+        self._events.append((time(),kind,state.symbol,values))
+        if self._wake is not None:
+            self._wake.set()
+
+
+    def summary(self)->Dict:
+        """Takes the queued events and summarises every symbol."""
+        events = [{"time":at,"event":kind,"symbol":symbol,
+                   "values":[getattr(v,"name",v) for v in values]}
+                  for at,kind,symbol,values in self._events]
+        self._events.clear()
+        ticks,self.ticks = self.ticks,0
+        return {"time":time(),
+                "ticks":ticks,
+                "events":events,
+                "symbols":{symbol:trade_summary(state,ticker)
+                           for symbol,(state,ticker) in self._latest.items()}}
+
+
+    def format(self,summary:Dict)->str:
+        if self._json_output:
+            return json.dumps(summary)
+
+        lines = [F"{summary['ticks']} ticks since the last report"]
+        for event in summary["events"]:
+            values = " ".join(str(v) for v in event["values"])
+            lines.append(F"{event['symbol']} {event['event']} {values}")
+        for symbol,s in summary["symbols"].items():
+            label = "Appx Balance" if s["in_market"] else "Current Balance"
+            line = (F"{symbol} candle {s['candle_elements']}/"
+                    F"{s['candle_period']}, {label}: {s['balance']}, "
+                    F"Coins: {s['coins']}, trades won/lost: "
+                    F"{s['gain_trades']}/{s['lose_trades']}")
+            if s["long_balance"] is not None:
+                line += F", Long Balance: {s['long_balance']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+    def flush(self):
+        """Emits a summary now if anything happened since the last one."""
+        if self.ticks or self._events:
+            self._output(self.format(self.summary()))
+
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        emitted = loop.time()
+        try:
+            while True:
+                # Summaries are timed from the last one emitted, so quiet
+                # periods are reported every interval seconds.
+                remaining = emitted + self._interval - loop.time()
+                if remaining > 0:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(),remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                early = emitted + self._min_interval - loop.time()
+                if early > 0:
+                    await asyncio.sleep(early)
+                self._wake.clear()
+                self.flush()
+                emitted = loop.time()
+        finally:
+            self._wake = None
+            self.flush()
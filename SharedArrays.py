@@ -0,0 +1,89 @@
+from __future__ import annotations
+from typing import Dict,Tuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# Segments attached in this process, kept referenced so the views handed out
+# stay valid until detach_arrays.
+_attached = {}
+
+
+class SharedArrays:
+    def __init__(self,arrays:Dict[str,np.ndarray]=None):
+        """Copies named arrays into shared memory segments so worker processes
+        can read them without each receiving a pickled copy. The creating
+        process owns the segments and must close them, which also unlinks
+        them, once the workers are done. Can be used as a context manager.
+        Parameters:
+            arrays (Dict[str,np.ndarray]): The arrays to share by name."""
+        self._segments = {}
+        self._arrays = {}
+        for name,array in (arrays or {}).items():
+            array = np.ascontiguousarray(array)
+            self.allocate(name,array.shape,array.dtype)[...] = array
+
+
+    def allocate(self,name:str,shape:Tuple,dtype:np.dtype)->np.ndarray:
+        """Adds a new zero filled shared array and returns a view over it."""
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))*dtype.itemsize
+        segment = shared_memory.SharedMemory(create=True,size=max(size,1))
+        array = np.ndarray(shape,dtype=dtype,buffer=segment.buf)
+        self._segments[name] = segment
+        self._arrays[name] = array
+        return array
+
+
+    def descriptor(self)->Dict[str,Tuple]:
+        """A picklable description of the segments for attach_arrays."""
+        return {name:(self._segments[name].name,array.shape,array.dtype.str)
+                for name,array in self._arrays.items()}
+
+
+    def arrays(self)->Dict[str,np.ndarray]:
+        """Writable views over the shared arrays in the owning process."""
+        return self._arrays
+
+
+    def close(self):
+        """Releases and unlinks every segment. Views from arrays() must not
+        be used afterwards."""
+        self._arrays = {}
+        for segment in self._segments.values():
+            segment.close()
+            segment.unlink()
+        self._segments = {}
+
+
+    def __enter__(self)->SharedArrays:
+        return self
+
+
+    def __exit__(self,*args):
+        self.close()
+
+
+def attach_arrays(descriptor:Dict[str,Tuple],
+                  writeable:bool=False)->Dict[str,np.ndarray]:
+    """Maps the arrays described by SharedArrays.descriptor into this process
+    without copying. Views are read only unless writeable is set, in which
+    case writers have to make sure they touch disjoint parts."""
+    arrays = {}
+    for name,(segment_name,shape,dtype) in descriptor.items():
+        if segment_name not in _attached:
+            _attached[segment_name] =\
+                shared_memory.SharedMemory(name=segment_name)
+        segment = _attached[segment_name]
+        array = np.ndarray(shape,dtype=np.dtype(dtype),buffer=segment.buf)
+        array.flags.writeable = writeable
+        arrays[name] = array
+    return arrays
+
+
+def detach_arrays(descriptor:Dict[str,Tuple]):
+    """Unmaps arrays attached by attach_arrays. Every view over them has to
+    be dropped first."""
+    for segment_name,shape,dtype in descriptor.values():
+        segment = _attached.pop(segment_name,None)
+        if segment is not None:
+            segment.close()
@@ -0,0 +1,140 @@
+"""Records the raw frames of the combined ticker stream to a compressed log and
+replays them from a local websocket server, so the trader can be run and
+measured offline. Record with
+    python StreamReplay.py record btcusdt.log.gz [seconds] [symbol ...]
+and replay at real time, N times real time or, with a speed of 0, as fast as
+the client reads with
+    python StreamReplay.py replay btcusdt.log.gz [speed] [port]
+then run python Trader.py ws://localhost:8765 [symbol ...] against it."""
+from __future__ import annotations
+from typing import Iterator,Tuple,Dict
+from time import time_ns
+import asyncio
+import gzip
+import json
+import sys
+import websockets
+
+replay_host = "localhost"
+replay_port = 8765
+
+
+class StreamRecorder:
+    def __init__(self,path:str):
+        """Appends frames to a gzip compressed log, one per line prefixed by
+        the nanosecond wall clock time it was received at. Can be used as a
+        context manager.
+        Parameters:
+            path (str): The log file to write."""
+        self._file = gzip.open(path,"at",encoding="utf-8")
+        self.frames = 0
+
+
+    def record(self,frame:str,timestamp:int=None):
+        if isinstance(frame,bytes):
+            frame = frame.decode("utf-8")
+        if timestamp is None:
+            timestamp = time_ns()
+        self._file.write(F"{timestamp}\t{frame}\n")
+        self.frames += 1
+
+
+    def close(self):
+        self._file.close()
+
+
+    def __enter__(self)->StreamRecorder:
+        return self
+
+
+    def __exit__(self,*args):
+        self.close()
+
+
+def read_recording(path:str)->Iterator[Tuple[int,str]]:
+    """Yields the (timestamp, frame) pairs of a recorded log in order."""
+    with gzip.open(path,"rt",encoding="utf-8") as file:
+        for line in file:
+            timestamp,frame = line.rstrip("\n").split("\t",1)
+            yield int(timestamp),frame
+
+
+async def record_stream(path:str,
+                        subscribe:Dict,
+                        uri:str="wss://stream.binance.com:9443/stream",
+                        seconds:float=None):
+    """Subscribes to a combined stream and records every frame after the
+    subscription reply until the time is up or the connection closes.
+    Parameters:
+        path (str): The log file to write.
+        subscribe (Dict): The subscription request, e.g. Trader's.
+        uri (str): The combined stream to connect to.
+        seconds (float): How long to record, None records until closed."""
+    with StreamRecorder(path) as recorder:
+        async with websockets.connect(uri,ping_interval=None) as ws:
+            await ws.send(json.dumps(subscribe))
+            print(F"Subscribed: {await ws.recv()}")
+
+            async def receive():
+                while True:
+                    recorder.record(await ws.recv())
+
+            try:
+                await asyncio.wait_for(receive(),seconds)
+            except (asyncio.TimeoutError,websockets.ConnectionClosed):
+                pass
+        print(F"Recorded {recorder.frames} frames to {path}")
+
+
+async def send_recording(ws,path:str,speed:float=1.0):
+    """Sends the frames of a log with their recorded spacing divided by
+    speed, or back to back when speed is 0."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first = None
+    for timestamp,frame in read_recording(path):
+        if speed:
+            if first is None:
+                first = timestamp
+            delay = start + (timestamp-first) / 1e9 / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await ws.send(frame)
+
+
+def replay_handler(path:str,speed:float=1.0):
+    """Returns a websockets connection handler which acts as the combined
+    stream: it answers the subscription request and then replays the log to
+    the client before closing the connection."""
+    async def handler(ws,*args):
+        request = json.loads(await ws.recv())
+        await ws.send(json.dumps({"result":None,"id":request.get("id")}))
+        await send_recording(ws,path,speed)
+    return handler
+
+
+async def serve_recording(path:str,
+                          speed:float=1.0,
+                          host:str=replay_host,
+                          port:int=replay_port):
+    """Serves a recording to every client that connects until cancelled.
+    Point Trader.stream_connection at ws://{host}:{port}."""
+    async with websockets.serve(replay_handler(path,speed),host,port):
+        print(F"Replaying {path} at ws://{host}:{port}, speed {speed}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    command,path = sys.argv[1],sys.argv[2]
+    if command == "record":
+        from Trader import stream_request,tickers
+        seconds = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        symbols = [a.lower() for a in sys.argv[4:]] or tickers
+        subscribe = stream_request("SUBSCRIBE",symbols,1)
+        asyncio.run(record_stream(path,subscribe,seconds=seconds))
+    elif command == "replay":
+        speed = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        port = int(sys.argv[4]) if len(sys.argv) > 4 else replay_port
+        asyncio.run(serve_recording(path,speed,port=port))
+    else:
+        print(__doc__)
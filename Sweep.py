@@ -0,0 +1,153 @@
+from __future__ import annotations
+from typing import List,Dict,Union,Tuple,Callable
+import inspect
+import json
+import pandas as pd
+import numpy as np
+
+from Backtest import node_decision_codes,resolve_tree,split_parameters
+from DataStructures.CompiledTree import CompiledTree
+from Decision import Decision
+from Population import simulate_trades,fitness_columns
+from RawIndicators.GenerateDecisions import decision_rules
+from RawIndicators.SeriesCache import SeriesCache
+
+sweep_columns = ["buy_threshold","sell_threshold"] + fitness_columns
+
+
+def node_ranges(data:Dict)->List[Dict[str,Tuple[float,float]]]:
+    """The (lower, upper) range of every variable of every node of a parsed
+    serialized tree, in the node order of CompiledTree.from_dict."""
+    ranges = []
+
+    def walk(tree:Dict):
+        if "parent" not in tree:
+            return
+        variables = tree["parent"]["variable"]["variables"]
+        ranges.append({k:(v["range"]["lower"],v["range"]["upper"])
+                       for k,v in variables.items() if "range" in v})
+        for child in tree["children"]:
+            walk(child)
+
+    walk(data)
+    return ranges
+
+
+def threshold_grid(bounds:Tuple[float,float],steps:int=11)->np.ndarray:
+    """Evenly spaced thresholds covering a variable's range, whichever way
+    round its bounds were written."""
+    lower,upper = bounds
+    return np.linspace(min(lower,upper),max(lower,upper),steps)
+
+
+def sweep_decisions(name:str,
+                    candles:pd.DataFrame,
+                    series_parameters:Dict,
+                    buy_thresholds:np.ndarray,
+                    sell_thresholds:np.ndarray,
+                    rules:Dict[str,Tuple[Callable,Callable]]=decision_rules,
+                    cache:SeriesCache=None)->np.ndarray:
+    """Computes an indicator series once and decides it at every pair of buy
+    and sell thresholds. The rules compare the series against thresholds
+    shaped to broadcast, so the whole grid is a single numpy operation.
+    Parameters:
+        name (str): The indicator name, which must have a threshold rule.
+        candles (pd.DataFrame): The full candle history.
+        series_parameters (Dict): The parameters of the series, e.g. period.
+        buy_thresholds (np.ndarray): The buy thresholds to try.
+        sell_thresholds (np.ndarray): The sell thresholds to try.
+        rules (Dict): Series function and decision rule per indicator name.
+        cache (SeriesCache): Where to look up series computed before.
+    Returns the Decision codes as an array of shape (buys,sells,candles)."""
+    series_function,rule = rules[name]
+    if "buy_threshold" not in inspect.signature(rule).parameters:
+        raise ValueError(F"The {name} indicator has no thresholds to sweep.")
+    if cache is None:
+        series = series_function(candles,**series_parameters)
+    else:
+        series = cache.call(series_function,candles,**series_parameters)
+
+    buys = np.asarray(buy_thresholds,dtype=np.float64).reshape(-1,1,1)
+    sells = np.asarray(sell_thresholds,dtype=np.float64).reshape(-1,1)
+    decisions = rule(series,buy_threshold=buys,sell_threshold=sells)
+    return np.broadcast_to(decisions,
+                           (buys.shape[0],sells.shape[0],candles.shape[0]))
+
+
+def sweep_node(tree:Union[str,Dict],
+               node:int,
+               candles:pd.DataFrame,
+               steps:int=11,
+               buy_thresholds:np.ndarray=None,
+               sell_thresholds:np.ndarray=None,
+               starting_balance:float=100.0,
+               commission:float=0.01,
+               warmup:int=0,
+               max_grid_bytes:int=2**28,
+               cache:SeriesCache=None,
+               bids:np.ndarray=None)->pd.DataFrame:
+    """Trades a tree with every pair of thresholds on one of its nodes. The
+    decisions of the other nodes and the node's own series are computed once,
+    then the node's decisions are computed for a block of buy thresholds at a
+    time with sweep_decisions and each pair is resolved through the tree and
+    traded with simulate_trades, buying at the closes and selling at bids.
+    Parameters:
+        tree (Union[str,Dict]): A serialized tree, as json or a parsed dict.
+        node (int): The node to sweep, in the order of CompiledTree.from_dict.
+        candles (pd.DataFrame): Candles as built by candles_from_ticker.
+        steps (int): Thresholds tried across each range when not given.
+        buy_thresholds (np.ndarray): Buy thresholds, defaults to the range of
+            the node's buy_threshold.
+        sell_thresholds (np.ndarray): Sell thresholds, defaults to the range
+            of the node's sell_threshold.
+        starting_balance (float): The balance every pair trades with.
+        commission (float): The fraction of every trade lost to fees.
+        warmup (int): Candles at the start on which no trades are made.
+        max_grid_bytes (int): Size limit of a block of node decisions.
+        cache (SeriesCache): Where to look up series computed before.
+        bids (np.ndarray): The sell price of every candle, e.g. from
+            candle_bids, defaults to the closes.
+    Returns a dataframe of the sweep_columns with a row per threshold pair."""
+    if isinstance(tree,str):
+        tree = json.loads(tree)
+    compiled = CompiledTree.from_dict(tree)
+    if "buy_threshold" not in compiled.parameters[node]:
+        raise ValueError(F"The {compiled.names[node]} node at {node} has no "
+                         "thresholds to sweep.")
+    ranges = node_ranges(tree)[node]
+    if buy_thresholds is None:
+        buy_thresholds = threshold_grid(ranges["buy_threshold"],steps)
+    if sell_thresholds is None:
+        sell_thresholds = threshold_grid(ranges["sell_threshold"],steps)
+
+    # The node's series is computed by node_decision_codes and then looked up.
+    if cache is None:
+        cache = SeriesCache()
+    codes = node_decision_codes(compiled,candles,cache=cache)
+    series_parameters,_ = split_parameters(compiled.parameters[node])
+    closes = candles["close"].to_numpy()
+
+    block = max(1,max_grid_bytes // max(len(sell_thresholds)*codes.shape[1],1))
+    results = []
+    for start in range(0,len(buy_thresholds),block):
+        buys = buy_thresholds[start:start+block]
+        grid = sweep_decisions(compiled.names[node],
+                               candles,
+                               series_parameters,
+                               buys,
+                               sell_thresholds,
+                               cache=cache)
+        for i,buy in enumerate(buys):
+            for j,sell in enumerate(sell_thresholds):
+                codes[node] = grid[i,j]
+                decisions = resolve_tree(compiled,codes)
+                decisions[:warmup] = Decision.HOLD
+                result = {"buy_threshold":buy,"sell_threshold":sell}
+                result.update(simulate_trades(decisions,
+                                              closes,
+                                              bids,
+                                              starting_balance=starting_balance,
+                                              commission=commission))
+                results.append(result)
+
+    return pd.DataFrame(results,columns=sweep_columns)
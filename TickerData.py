@@ -0,0 +1,131 @@
+from __future__ import annotations
+from typing import List,Dict,Iterator
+import pandas as pd
+import numpy as np
+import os
+
+ticker_columns = ["best_bid","best_ask","total_traded_asset"]
+
+
+def read_ticker_blocks(path:str,
+                       columns:List[str]=ticker_columns,
+                       block_size:int=1_000_000)->Iterator[Dict[str,np.ndarray]]:
+    """Streams a ticker csv in blocks of rows. Only the requested columns are
+    parsed and they are read straight into float64, so no other columns or
+    python objects are ever built.
+    Parameters:
+        path (str): The ticker csv file.
+        columns (List[str]): The columns to read.
+        block_size (int): The number of rows per block.
+    Yields a dict of column name to float64 array for every block."""
+    dtypes = {c:np.float64 for c in columns}
+    with pd.read_csv(path,
+                     usecols=columns,
+                     dtype=dtypes,
+                     chunksize=block_size,
+                     engine="c") as reader:
+        for chunk in reader:
+            yield {c:chunk[c].to_numpy() for c in columns}
+
+
+def sidecar_path(path:str,column:str=None,cache_format:str="npy")->str:
+    """Returns where the cached copy of a csv lives. npy caches use one file
+    per column, parquet caches one file for all columns."""
+    if cache_format == "npy":
+        return F"{path}.{column}.npy"
+    return F"{path}.parquet"
+
+
+def _is_fresh(path:str,sidecars:List[str])->bool:
+    """Sidecars are stale when missing or older than the csv they mirror."""
+    source_time = os.path.getmtime(path)
+    return all(os.path.exists(s) and os.path.getmtime(s) >= source_time
+               for s in sidecars)
+
+
+def _write_npy(sidecar:str,values:np.ndarray):
+    """Write through a temporary file so a crash never leaves a half written
+    sidecar behind that would look fresh."""
+    temporary = sidecar + ".tmp"
+    with open(temporary,"wb") as file:
+        np.save(file,values)
+    os.replace(temporary,sidecar)
+
+
+def _write_parquet(sidecar:str,ticker:Dict[str,np.ndarray]):
+    """Write the parquet sidecar through a temporary file like _write_npy."""
+    temporary = sidecar + ".tmp"
+    with open(temporary,"wb") as file:
+        pd.DataFrame(ticker).to_parquet(file,index=False)
+    os.replace(temporary,sidecar)
+
+
+def load_ticker(path:str,
+                columns:List[str]=ticker_columns,
+                cache:bool=True,
+                cache_format:str="npy",
+                block_size:int=1_000_000)->Dict[str,np.ndarray]:
+    """Loads the requested ticker columns as float64 arrays. With cache the
+    csv is converted once to a sidecar next to it and later runs load the
+    sidecar instead. npy sidecars are memory mapped so the data is paged in
+    on demand. parquet sidecars need pyarrow and are read with a memory
+    mapped file. Sidecars older than the csv are rebuilt, and so is a parquet
+    sidecar lacking a requested column, keeping the columns it had.
+    Parameters:
+        path (str): The ticker csv file.
+        columns (List[str]): The columns to load.
+        cache (bool): Whether to read and write the sidecar cache.
+        cache_format (str): Either "npy" or "parquet".
+        block_size (int): The number of rows parsed at a time.
+    Returns a dict of column name to array."""
+    if cache_format not in ("npy","parquet"):
+        raise ValueError(F"Unknown ticker cache format {cache_format}")
+
+    if cache_format == "npy":
+        sidecars = {c:sidecar_path(path,c) for c in columns}
+    else:
+        sidecars = {c:sidecar_path(path,cache_format=cache_format)
+                    for c in columns}
+
+    requested = columns
+    if cache and _is_fresh(path,list(sidecars.values())):
+        if cache_format == "npy":
+            return {c:np.load(s,mmap_mode="r") for c,s in sidecars.items()}
+        import pyarrow.parquet
+
+        sidecar = sidecar_path(path,cache_format=cache_format)
+        cached = pyarrow.parquet.read_schema(sidecar).names
+        if all(c in cached for c in columns):
+            frame = pd.read_parquet(sidecar,columns=columns,memory_map=True)
+            return {c:frame[c].to_numpy() for c in columns}
+        columns = list(dict.fromkeys(cached + columns))
+
+    blocks = list(read_ticker_blocks(path,columns,block_size))
+    if blocks:
+        ticker = {c:np.concatenate([b[c] for b in blocks]) for c in columns}
+    else:
+        ticker = {c:np.empty(0,dtype=np.float64) for c in columns}
+
+    if not cache:
+        return ticker
+
+    if cache_format == "npy":
+        for c,s in sidecars.items():
+            _write_npy(s,ticker[c])
+        return {c:np.load(s,mmap_mode="r") for c,s in sidecars.items()}
+
+    _write_parquet(sidecar_path(path,cache_format=cache_format),ticker)
+    return {c:ticker[c] for c in requested}
+
+
+def ticker_rows(ticker:Dict[str,np.ndarray],
+                block_size:int=100_000)->Iterator[Dict[str,float]]:
+    """Yields one dict of python floats per row for the incremental candle
+    path. Rows are converted a block at a time, so even a memory mapped
+    ticker is never held in memory as dicts all at once."""
+    names = list(ticker)
+    size = len(ticker[names[0]]) if names else 0
+    for start in range(0,size,block_size):
+        block = [ticker[n][start:start+block_size].tolist() for n in names]
+        for values in zip(*block):
+            yield dict(zip(names,values))
@@ -0,0 +1,117 @@
+from __future__ import annotations
+from typing import Dict,Callable
+import json
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class TickerUpdate:
+    """The fields of a combined stream @ticker message the trader uses,
+    parsed to floats once. Indexing by the ticker_mapping names is supported
+    so it can stand in for the dict from parse_ticker_data_row."""
+    __slots__ = ("stream","best_bid","best_ask","total_traded_asset")
+
+    def __init__(self,
+                 stream:str,
+                 best_bid:float,
+                 best_ask:float,
+                 total_traded_asset:float):
+        self.stream = stream
+        self.best_bid = best_bid
+        self.best_ask = best_ask
+        self.total_traded_asset = total_traded_asset
+
+
+    def __getitem__(self,name:str)->float:
+        return getattr(self,name)
+
+
+    def as_dict(self)->Dict:
+        return {"best_bid":self.best_bid,
+                "best_ask":self.best_ask,
+                "total_traded_asset":self.total_traded_asset}
+
+
+    def __repr__(self)->str:
+        return (F"TickerUpdate({self.stream}, bid={self.best_bid}, "
+                F"ask={self.best_ask}, traded={self.total_traded_asset})")
+
+
+def _decode_json(frame:str)->TickerUpdate:
+    message = json.loads(frame)
+    data = message.get("data")
+    if data is None or "a" not in data:
+        return None
+    return TickerUpdate(message["stream"],
+                        float(data["b"]),
+                        float(data["a"]),
+                        float(data["w"]))
+
+
+def _decode_orjson(frame:str)->TickerUpdate:
+    message = orjson.loads(frame)
+    data = message.get("data")
+    if data is None or "a" not in data:
+        return None
+    return TickerUpdate(message["stream"],
+                        float(data["b"]),
+                        float(data["a"]),
+                        float(data["w"]))
+
+
+if msgspec is not None:
+    class _TickerData(msgspec.Struct):
+        b:float
+        a:float
+        w:float
+
+    class _TickerMessage(msgspec.Struct):
+        stream:str
+        data:_TickerData
+
+    # Without strict the decoder converts Binance's quoted numbers to floats
+    # itself and skips every field not declared above.
+    _msgspec_decoder = msgspec.json.Decoder(_TickerMessage,strict=False)
+
+    def _decode_msgspec(frame:str)->TickerUpdate:
+        try:
+            message = _msgspec_decoder.decode(frame)
+        except msgspec.ValidationError:
+            return None
+        data = message.data
+        return TickerUpdate(message.stream,data.b,data.a,data.w)
+
+
+ticker_decoders = {"json":_decode_json}
+if orjson is not None:
+    ticker_decoders["orjson"] = _decode_orjson
+if msgspec is not None:
+    ticker_decoders["msgspec"] = _decode_msgspec
+
+
+def ticker_decoder(backend:str=None)->Callable[[str],TickerUpdate]:
+    """Returns a function decoding a combined stream frame into a
+    TickerUpdate, or None for frames which are not ticker updates such as
+    subscription replies. Only the bid, ask and traded asset fields are
+    converted. msgspec decodes straight into typed fields, orjson is a
+    faster json parser, and the standard json module is used when neither is
+    installed.
+    Parameters:
+        backend (str): One of ticker_decoders, the fastest available if None.
+    Returns the decoding function."""
+    if backend is None:
+        for backend in ("msgspec","orjson","json"):
+            if backend in ticker_decoders:
+                break
+    return ticker_decoders[backend]
+
+
+decode_ticker = ticker_decoder()
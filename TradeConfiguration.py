@@ -1,12 +1,15 @@
-from DataBuffer import DataBuffer
-from typing import Dict
-from Candle import new_candle
+from typing import Dict,Any
+from Candle import new_candle,CandleStore
+from Decision import Decision
 from TreeIO import deserialize_tree
 from dataclasses import dataclass,field
 
 @dataclass
 class TradingConfiguration:
-    """Running Parameters for building our candles and storing the state."""
+    """Running Parameters for building our candles and storing the state of
+    one traded symbol. Each instance loads its own tree from tree_file and
+    keeps its own candle buffer, written to {symbol}_trade_candles.csv."""
+    symbol:str = "btcusdt"
     first_price:float = None
     initial_coin_balance:float = None
 
@@ -19,7 +22,7 @@ class TradingConfiguration:
     current_balance:float = 100.0
     bought_balance:float = 0.0
     coin_balance:float = 0.0
-    prev_decision:str = "SELL"
+    prev_decision:Decision = Decision.SELL
     gain_trades:int = 0
     lose_trades:int = 0
     
@@ -27,10 +30,18 @@ class TradingConfiguration:
     commission:float = 0.01
     fee:float = 1 - commission
 
-    tree = None
-    with open("./SerializedTrees/popfile-0.json") as file:
-        tree = deserialize_tree(file.read())
+    tree_file:str = "./SerializedTrees/popfile-0.json"
+    tree:Any = None
+    candle_buffer:CandleStore = None
 
-    candle_buffer = DataBuffer(max_size=candle_period*2,
-        filename="trade_candles.csv",
-        header=["open","high","low","close","volume","elements"])
\ No newline at end of file
+    def __post_init__(self):
+        if self.tree is None:
+            with open(self.tree_file) as file:
+                self.tree = deserialize_tree(file.read(),
+                                             compiled=True,
+                                             lazy=True)
+
+        if self.candle_buffer is None:
+            self.candle_buffer = CandleStore(
+                max_size=self.candle_period*2,
+                filename=F"{self.symbol}_trade_candles.csv")
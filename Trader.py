@@ -1,33 +1,28 @@
-from typing import Dict,List,Any
+from typing import Dict,List,Any,Callable
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import websockets
 import json
 from datetime import datetime,timezone
-from time import time
+from time import time,perf_counter_ns
 from dataclasses import dataclass,field
+import tracemalloc
+import sys
 import os
 
-from DataBuffer import DataBuffer
 from Candle import new_candle,update_current_candle
+from Decision import Decision
+from Pipeline import Pipeline,StageQueue
 from TreeActions import evaluate_next_value,make_tree_decision
-from TreeIO import deserialize_tree
 from TradeConfiguration import TradingConfiguration
-from Reporting import live_trade_report
+from Reporting import Reporter
+from TickerDecoding import decode_ticker
+from Latency import LatencyRecorder
 
 tickers = [
     "btcusdt"
 ]
 
-stream_subscribe = {
-    "method": "SUBSCRIBE",
-    "params": [t+"@ticker" for t in tickers],
-    "id": 1
-}
-stream_unsubscribe = {
-    "method": "UNSUBSCRIBE",
-    "params": [t+"@ticker" for t in tickers],
-    "id": 2
-}
 ticker_mapping = {
     "b":"best_bid",
     "a":"best_ask",
@@ -37,7 +32,41 @@ ticker_mapping = {
 raw_stream_uri = "wss://stream.binance.com:9443/ws"
 combined_stream_uri = "wss://stream.binance.com:9443/stream"
 
-trade_state = TradingConfiguration(candle_period=30,build_period=0)
+# Trading state of every symbol, kept across reconnects, and the memory in
+# bytes each took to set up.
+trade_states = {}
+symbol_memory = {}
+
+# Sizes of the queues between the stages of the trader pipeline. Frames are
+# dropped oldest first if parsing falls behind, so the socket is always read.
+frame_queue_size = 1024
+ticker_queue_size = 1024
+candle_queue_size = 64
+metrics_interval = 60
+
+pipeline = None
+
+# Trees are evaluated off the event loop on a single decision thread, so the
+# socket keeps being read meanwhile. Tree evaluation is pure Python and holds
+# the GIL, so more threads would not decide any faster: symbols closing a
+# candle together are evaluated one after another, each in candle order.
+decision_executor = None
+# Decisions thrown away because a newer candle closed while computing them.
+stale_decisions = 0
+
+# Summaries are written in the background every report_interval seconds, or
+# sooner after a trade or candle close.
+report_interval = 10.0
+reporter = Reporter(interval=report_interval)
+
+# Latency histograms of the hot path stages, all timed with perf_counter_ns:
+# time frames wait before being decoded, decoding, the candle update, the
+# tree update and the tree decision of a closed candle, dispatching the
+# trade, and tick_to_decision from receiving the tick closing a candle to its
+# decision having been dispatched.
+latency_stages = ["frame_wait","decode","candle_update","evaluate",
+                  "tree_decision","dispatch","tick_to_decision"]
+latency = LatencyRecorder(latency_stages)
 
 
 def parse_ticker_data_row(data:Dict)->Dict:
@@ -45,70 +74,238 @@ def parse_ticker_data_row(data:Dict)->Dict:
     return {v:data[k] for k,v in ticker_mapping.items()}
 
 
-def make_trading_decision(ticker:Dict):
+def new_trade_state(symbol:str)->TradingConfiguration:
+    """Sets up the trading state of a symbol, recording in symbol_memory the
+    bytes allocated for its tree, candle buffer and balances."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = TradingConfiguration(symbol=symbol,candle_period=30,build_period=0)
+    symbol_memory[symbol] = tracemalloc.get_traced_memory()[0] - before
+    if not tracing:
+        tracemalloc.stop()
+    return state
+
+
+def stream_request(method:str,symbols:List[str],request_id:int)->Dict:
+    """The SUBSCRIBE or UNSUBSCRIBE request for the ticker streams of
+    symbols."""
+    return {"method":method,
+            "params":[s+"@ticker" for s in symbols],
+            "id":request_id}
+
+
+def next_tree_decision(state:TradingConfiguration,
+                       pushed:int,
+                       superseded:Callable[[],bool]=None,
+                       timings:Dict=None)->Decision:
+    """Updates the tree with the latest candle in the buffer and returns its
+    decision, or None while still building candles. The tree is only
+    followed down to a decision if no newer candle has closed in the
+    meantime. Can run on the decision thread, reading the candle buffer in
+    place rather than a copy: pushed pins the snapshot it was called for, and
+    the buffer is not pushed to again until this returns. Should the buffer
+    have moved on anyway, the snapshot is stale and there is no decision.
+    Parameters:
+        state (TradingConfiguration): The symbol to decide on.
+        pushed (int): The pushed count of the candle buffer when submitted.
+        superseded (Callable): Tells whether a newer candle has closed.
+        timings (Dict): Receives the nanoseconds the tree took to evaluate
+            and to decide, to be recorded by the caller's thread.
+    Returns the Decision, or None when there is none to act on."""
+    if state.candle_buffer.pushed() != pushed:
+        return None
+    start = perf_counter_ns()
+    evaluate_next_value(node=state.tree,
+                        candles=state.candle_buffer)
+    evaluated = perf_counter_ns()
+    if timings is not None:
+        timings["evaluate"] = evaluated - start
+
+    if state.candle_buffer.current_size() <= state.build_period:
+        return None
+    if superseded is not None and superseded():
+        return None
+    decision = make_tree_decision(state.tree)
+    if timings is not None:
+        timings["tree_decision"] = perf_counter_ns() - evaluated
+    return decision
+
+
+def make_trading_decision(state:TradingConfiguration,ticker:Dict):
     """Generate next decision if it is valid to do so."""
-    global trade_state
-    evaluate_next_value(node=trade_state.tree,
-                        candles=trade_state.candle_buffer.get_all())
-
-    if trade_state.candle_buffer.current_size() > trade_state.build_period:
-        decision = make_tree_decision(trade_state.tree)
-        print(F"Decision made: {decision}\n")
-
-        if trade_state.prev_decision == "SELL" and decision == "BUY":
-            # Simulated balance as if we sold now
-            trade_state.coin_balance =\
-                (trade_state.current_balance / float(ticker["best_ask"]))\
-                    *trade_state.fee
-            trade_state.bought_balance = trade_state.current_balance
-            
-            trade_state.prev_decision = "BUY"
-            print("--------------------------------------")
-            print("Made a BUY trade")
-            print("--------------------------------------")
-            return
+    decision = next_tree_decision(state,state.candle_buffer.pushed())
+    if decision is not None:
+        apply_trading_decision(state,decision,ticker)
 
-        if trade_state.prev_decision == "BUY" and decision == "SELL":
-            trade_state.current_balance =\
-                (trade_state.coin_balance * float(ticker["best_bid"]))\
-                    *trade_state.fee
 
-            trade_state.coin_balance = 0.0
+def apply_trading_decision(state:TradingConfiguration,
+                           decision:Decision,
+                           ticker:Dict):
+    """Simulates the trade a decision calls for at the ticker's prices."""
+    reporter.event("decision",state,decision)
 
-            if trade_state.bought_balance > trade_state.current_balance:
-                trade_state.lose_trades += 1
-            elif trade_state.bought_balance < trade_state.current_balance:
-                trade_state.gain_trades += 1
+    if state.prev_decision == Decision.SELL\
+            and decision == Decision.BUY:
+        # Simulated balance as if we sold now
+        state.coin_balance =\
+            (state.current_balance / float(ticker["best_ask"]))\
+                *state.fee
+        state.bought_balance = state.current_balance
+        
+        state.prev_decision = Decision.BUY
+        reporter.event("trade",state,Decision.BUY,state.coin_balance)
+        return
 
-            trade_state.prev_decision = "SELL"
-            print("--------------------------------------")
-            print("Made a SELL trade")
-            print("--------------------------------------")
-            return
+    if state.prev_decision == Decision.BUY\
+            and decision == Decision.SELL:
+        state.current_balance =\
+            (state.coin_balance * float(ticker["best_bid"]))\
+                *state.fee
+
+        state.coin_balance = 0.0
 
+        if state.bought_balance > state.current_balance:
+            state.lose_trades += 1
+        elif state.bought_balance < state.current_balance:
+            state.gain_trades += 1
 
-async def trader(ws,ticker:str):
-    global trade_state
-    
-    period_counter = 0
+        state.prev_decision = Decision.SELL
+        reporter.event("trade",state,Decision.SELL,state.current_balance)
+        return
+
+
+async def receive_frames(ws,frames:StageQueue):
+    """Reads the socket as fast as messages arrive. Frames go into a queue
+    which never makes the reader wait. Once the connection closes the frames
+    already received are processed before the error is raised."""
+    try:
+        while True:
+            frame = await ws.recv()
+            frames.put_nowait((perf_counter_ns(),frame))
+            # recv returns without suspending while frames are buffered, so
+            # yield to let the stages run.
+            await asyncio.sleep(0)
+    except websockets.ConnectionClosed:
+        await pipeline.drain()
+        raise
+
+
+def metrics_snapshot()->Dict:
+    """Everything measured about the trader, for exporters."""
+    return {"pipeline":pipeline.metrics() if pipeline else {},
+            "latency":latency.snapshot(),
+            "stale_decisions":stale_decisions,
+            "symbol_memory":dict(symbol_memory)}
+
+
+async def log_metrics(interval:float=metrics_interval):
+    """Prints the queue depths and throughput of every pipeline stage and the
+    latency percentiles of the hot path."""
     while True:
-        data = json.loads(await ws.recv())
-        start_t = time()
+        await asyncio.sleep(interval)
+        print(F"Pipeline metrics: {pipeline.metrics()}, "
+              F"stale decisions: {stale_decisions}")
+        print(latency.dump())
+
+
+async def trader(ws,symbols:List[str]=tickers):
+    """Trades every symbol off the combined ticker stream through a pipeline
+    of stages connected by bounded queues: the socket receiver, the json
+    parser, which dispatches tickers by stream name, and per symbol a candle
+    builder and a decision engine. Raw frames are dropped oldest first when
+    the parser falls behind, while parsed tickers and completed candles are
+    never dropped so candles and decisions stay exact. Ticks, candle closes
+    and trades are handed to the background reporter without formatting.
+    Trees are evaluated on the decision thread, and a decision is discarded
+    rather than traded on if another candle of its symbol closed while it
+    was computed. Queue depths and counters are available from
+    pipeline.metrics(), and with the stage latencies from metrics_snapshot()."""
+    global pipeline,decision_executor
+    for symbol in symbols:
+        if symbol not in trade_states:
+            trade_states[symbol] = new_trade_state(symbol)
+    print(F"Memory per symbol: {symbol_memory}")
+
+    pipeline = Pipeline()
+    frames = pipeline.queue("frames",
+                            max_size=frame_queue_size,
+                            policy="drop_oldest")
+    inboxes = {}
+
+    for symbol in symbols:
+        state = trade_states[symbol]
+        ticker_queue = pipeline.queue(F"{symbol}.tickers",
+                                      max_size=ticker_queue_size)
+        candles = pipeline.queue(F"{symbol}.candles",
+                                 max_size=candle_queue_size)
+        inboxes[symbol+"@ticker"] = ticker_queue
+
+        # Defaults bind the state and queues of this symbol to its stages.
+        async def build_candle(tick:tuple,state=state,candles=candles):
+            received,ticker_data = tick
+            start = perf_counter_ns()
+            closed = update_current_candle(state,ticker_data)
+            latency.since("candle_update",start)
+            if closed:
+                candle = state.current_candle
+                state.current_candle = new_candle()
+                await candles.put((candle,ticker_data,received))
+            reporter.tick(state,ticker_data)
+
+        async def decide(closed:tuple,state=state,candles=candles):
+            global stale_decisions
+            candle,ticker_data,received = closed
+            state.candle_buffer.push(candle)
+            pushed = state.candle_buffer.pushed()
+            reporter.event("candle",state,pushed)
+            superseded = lambda: candles.depth() > 0
+            timings = {}
+
+            # The socket keeps being read while the tree is evaluated.
+            decision = await asyncio.get_running_loop().run_in_executor(
+                decision_executor,next_tree_decision,
+                state,pushed,superseded,timings)
+            for stage,nanoseconds in timings.items():
+                latency.record(stage,nanoseconds)
+            if superseded():
+                reporter.event("stale",state,pushed)
+                stale_decisions += 1
+                return
+            if decision is not None:
+                start = perf_counter_ns()
+                apply_trading_decision(state,decision,ticker_data)
+                dispatched = latency.since("dispatch",start)
+                latency.record("tick_to_decision",dispatched-received)
+
+        pipeline.stage(F"{symbol}.candle_builder",ticker_queue,build_candle)
+        pipeline.stage(F"{symbol}.decision_engine",candles,decide)
+
+    async def parse(frame:tuple):
+        received,frame = frame
+        start = latency.since("frame_wait",received)
+        ticker_data = decode_ticker(frame)
+        latency.since("decode",start)
+        if ticker_data is None:
+            return
+        inbox = inboxes.get(ticker_data.stream)
+        if inbox is not None:
+            await inbox.put((received,ticker_data))
 
-        if data["stream"] == ticker+"@ticker":
-            print(F"Next Candle: {period_counter}/{trade_state.candle_period}")
-            period_counter += 1
-            if period_counter == trade_state.candle_period:
-                period_counter = 0
-            
-            ticker_data = parse_ticker_data_row(data["data"])
-            live_trade_report(trade_state,ticker_data)
+    pipeline.stage("parser",frames,parse)
 
-            if update_current_candle(trade_state,ticker_data):
-                print("!--------- Pushing New Candle ------------!")
-                trade_state.candle_buffer.push(trade_state.current_candle)
-                trade_state.current_candle = new_candle()
-                make_trading_decision(ticker_data)
+    decision_executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix="decisions")
+    try:
+        await pipeline.run(receive_frames(ws,frames),
+                           keep_alive(ws),
+                           log_metrics(),
+                           reporter.run())
+    finally:
+        # No decision may still be running when a reconnect pushes candles.
+        decision_executor.shutdown(wait=True)
+        print(latency.dump())
 
 
 async def keep_alive(ws):
@@ -120,23 +317,35 @@ async def keep_alive(ws):
         await ws.pong()
 
 
-async def stream_connection():
+async def stream_connection(uri:str=combined_stream_uri,
+                            symbols:List[str]=tickers):
+    """Trades symbols off the ticker streams at uri, reconnecting on errors."""
     while True:
         try:
-            async with websockets.connect(combined_stream_uri,ping_interval=None) as ws:
-                await ws.send(json.dumps(stream_subscribe))
+            async with websockets.connect(uri,ping_interval=None) as ws:
+                await ws.send(
+                    json.dumps(stream_request("SUBSCRIBE",symbols,1)))
                 
                 res = json.loads(await ws.recv())
                 if res != {"result": None,"id": 1}:
                     print(F"Invalid response on subscribe {res}")
                     raise RuntimeError
 
-                await asyncio.gather(keep_alive(ws),trader(ws,"btcusdt"))
+                await trader(ws,symbols)
 
-                res = await ws.send(json.dumps(stream_unsubscribe))
+                res = await ws.send(
+                    json.dumps(stream_request("UNSUBSCRIBE",symbols,2)))
         except Exception as e:
             print(F"Encountered error: {e}")
             print("Restarting socket connection...")
             continue
 
-asyncio.run(stream_connection())
\ No newline at end of file
+if __name__ == "__main__":
+    # python Trader.py [uri] [symbol ...]. A uri, e.g. of a StreamReplay
+    # server, replaces Binance's, and symbols replace tickers.
+    arguments = sys.argv[1:]
+    uri = combined_stream_uri
+    if arguments and "://" in arguments[0]:
+        uri = arguments.pop(0)
+    symbols = [a.lower() for a in arguments] or tickers
+    asyncio.run(stream_connection(uri,symbols))
\ No newline at end of file
@@ -1,36 +1,51 @@
 from __future__ import annotations
-from typing import List,Dict
+from typing import List,Dict,Callable
+from Candle import CandleStore
+from Decision import Decision
 from DataStructures.Node import Node
 from DataStructures.Terminal import Terminal
+from DataStructures.CompiledTree import CompiledTree
 
-def stringify_tree(node:Node,previous:str="",_depth:int=0)->str:
+def stringify_tree(node:Node,
+                   previous:str="",
+                   annotate:Callable[[Node],str]=None,
+                   _depth:int=0)->str:
     """Prints a tree like structure to the terminal when passed a node in a 
     tree.
     Parameters:
         previous (str): Can be used to prefix the printed tree with some text.
+        annotate (Callable): Gives text to show after each node or terminal,
+            such as the timings of TreeProfiler.
     Returns the tree structure string representation of the node.
     """
+    def note(node:Node)->str:
+        return F" {annotate(node)}" if annotate is not None else ""
+
     output = ""
     if node.is_root() or _depth == 0:
-        output += F"\n[{node}]"
+        output += F"\n[{node}]{note(node)}"
         if isinstance(node,Terminal):
             return output
     
     children,last = node.children()[:-1],node.children()[-1]
     for child in children:
         if isinstance(child,Terminal):
-            output += F"\n{previous}├───{child}"
+            output += F"\n{previous}├───{child}{note(child)}"
         else:
-            output += F"\n{previous}├───[{child}]"
+            output += F"\n{previous}├───[{child}]{note(child)}"
             output += stringify_tree(node=child,
                                      previous=previous+"│   ",
+                                     annotate=annotate,
                                      _depth=_depth+1)
 
     if isinstance(last,Terminal):
-        output += F"\n{previous}└───{last}"
+        output += F"\n{previous}└───{last}{note(last)}"
     else:
-        output += F"\n{previous}└───[{last}]"
-        output += stringify_tree(last,previous=previous+"    ",_depth=_depth+1)
+        output += F"\n{previous}└───[{last}]{note(last)}"
+        output += stringify_tree(last,
+                                 previous=previous+"    ",
+                                 annotate=annotate,
+                                 _depth=_depth+1)
     
     return output
 
@@ -40,8 +55,12 @@ def pprint_tree(node:Node):
     print(stringify_tree(node))
 
 
-def evaluate_next_value(node:Node,candles:List[Dict]):
+def evaluate_next_value(node:Node,candles:CandleStore):
     """Descend through the tree and update the indicators in each node."""
+    if isinstance(node,CompiledTree):
+        node.evaluate(candles)
+        return
+
     if isinstance(node,Terminal):
         return
     
@@ -50,10 +69,13 @@ def evaluate_next_value(node:Node,candles:List[Dict]):
         evaluate_next_value(child,candles)
 
 
-def make_tree_decision(node:Node)->str:
-    """Returns the string decision result of traversing the decision tree."""
+def make_tree_decision(node:Node)->Decision:
+    """Returns the decision result of traversing the decision tree."""
+    if isinstance(node,CompiledTree):
+        return node.decide()
+
     if isinstance(node,Terminal):
-        return str(node)
+        return node.decision()
 
     next_node = node.get_decision()
     return make_tree_decision(next_node)
\ No newline at end of file
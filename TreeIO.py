@@ -1,24 +1,45 @@
 import json
+from typing import Union
 from DataStructures.Node import Node
 from DataStructures.Terminal import Terminal
+from DataStructures.CompiledTree import CompiledTree
+from Indicators.IndicatorRegistry import IndicatorRegistry
 
-def deserialize_tree(json_data:str,_depth:int=0)->Node:
+def deserialize_tree(json_data:str,
+                     compiled:bool=False,
+                     shared:bool=True,
+                     lazy:bool=False,
+                     _depth:int=0,
+                     _registry:IndicatorRegistry=None)->Union[Node,CompiledTree]:
     """Read in a serialized tree and convert it into a node tree. Returns the
     root node.
     Parameters:
         json_data (str): json serialized tree representation. 
+        compiled (bool): Return the tree flattened into a CompiledTree instead
+            of the root node.
+        shared (bool): Nodes using the same indicator share one computation
+            instead of each keeping their own copy.
+        lazy (bool): With compiled, only compute window only indicators when
+            a decision reaches their node. See CompiledTree.
         depth (int): Default to 0, shouldn't be modified since its used for
             recursion."""
     tree = json_data
     if _depth == 0:
         tree = json.loads(json_data)
+        if shared:
+            _registry = IndicatorRegistry()
 
     if "parent" not in tree:
-        return Terminal.terminal_from_dict(tree)
-    node = Node.node_from_dict(tree["parent"])
-    
-    for child in tree["children"]:
-        node.add_child(deserialize_tree(child,_depth=_depth+1))
+        node = Terminal.terminal_from_dict(tree)
+    else:
+        node = Node.node_from_dict(tree["parent"],registry=_registry)
+        for child in tree["children"]:
+            node.add_child(deserialize_tree(child,
+                                            _depth=_depth+1,
+                                            _registry=_registry))
+
+    if compiled and _depth == 0:
+        return CompiledTree.from_tree(node,lazy=lazy)
 
     if node.is_root():
         return node
\ No newline at end of file
@@ -0,0 +1,164 @@
+from __future__ import annotations
+from typing import Dict,List,Union
+from time import perf_counter_ns
+
+from DataStructures.BaseNode import BaseNode
+from DataStructures.Node import Node
+from DataStructures.Terminal import Terminal
+from Decision import Decision
+from TreeActions import stringify_tree
+
+
+class NodeProfile:
+    __slots__ = ("name","evaluate_calls","evaluate_ns",
+                 "decision_calls","decision_ns","branches")
+
+    def __init__(self,name:str):
+        """Counters of one profiled node. branches counts how often the node
+        led to its BUY, HOLD and SELL child."""
+        self.name = name
+        self.evaluate_calls = 0
+        self.evaluate_ns = 0
+        self.decision_calls = 0
+        self.decision_ns = 0
+        self.branches = [0,0,0]
+
+
+    def as_dict(self)->Dict:
+        return {"name":self.name,
+                "evaluate_calls":self.evaluate_calls,
+                "evaluate_seconds":self.evaluate_ns / 1e9,
+                "decision_calls":self.decision_calls,
+                "decision_seconds":self.decision_ns / 1e9,
+                "branches":{d.name:self.branches[d] for d in Decision}}
+
+
+class TreeProfiler:
+    def __init__(self,root:Node):
+        """Opt in profiler of a node tree. While enabled, Node.evaluate and
+        Node.get_decision of every node are wrapped to count calls, time them
+        and count which branch each decision took, keyed by node_id. Nothing
+        is wrapped while disabled, so an unprofiled tree runs at full speed.
+        Profile the object tree from deserialize_tree rather than a compiled
+        one. When nodes share an indicator, its update is timed on the first
+        node evaluated for a candle and the others are nearly free. Can be
+        used as a context manager.
+        Parameters:
+            root (Node): The root of the tree to profile."""
+        self.root = root
+        self.profiles = {}
+        self._wrapped = []
+
+
+    def _nodes(self)->List[Node]:
+        nodes = []
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            if isinstance(node,Node):
+                nodes.append(node)
+                pending.extend(node.children())
+        return nodes
+
+
+    def enable(self):
+        if self._wrapped:
+            return
+        for node in self._nodes():
+            profile = self.profiles.get(node.node_id())
+            if profile is None:
+                profile = self.profiles[node.node_id()] = NodeProfile(node.name())
+            self._wrap(node,profile)
+            self._wrapped.append(node)
+
+
+    def _wrap(self,node:Node,profile:NodeProfile):
+        evaluate = node.evaluate
+        get_decision = node.get_decision
+        children = node.children()
+
+        def profiled_evaluate(candles):
+            start = perf_counter_ns()
+            evaluate(candles)
+            profile.evaluate_ns += perf_counter_ns() - start
+            profile.evaluate_calls += 1
+
+        def profiled_get_decision()->Union[Node,Terminal]:
+            start = perf_counter_ns()
+            child = get_decision()
+            profile.decision_ns += perf_counter_ns() - start
+            profile.decision_calls += 1
+            for index,candidate in enumerate(children):
+                if candidate is child:
+                    profile.branches[index] += 1
+                    break
+            return child
+
+        node.evaluate = profiled_evaluate
+        node.get_decision = profiled_get_decision
+
+
+    def disable(self):
+        """Removes the wrappers, keeping the counts gathered so far."""
+        for node in self._wrapped:
+            del node.evaluate
+            del node.get_decision
+        self._wrapped = []
+
+
+    def reset(self):
+        for profile in self.profiles.values():
+            profile.__init__(profile.name)
+
+
+    def __enter__(self)->TreeProfiler:
+        self.enable()
+        return self
+
+
+    def __exit__(self,*args):
+        self.disable()
+
+
+    def stats(self)->Dict[str,Dict]:
+        """The counters of every node by node_id."""
+        return {node_id:profile.as_dict()
+                for node_id,profile in self.profiles.items()}
+
+
+    def visits(self,node:BaseNode)->int:
+        """How many decisions reached a node or terminal."""
+        parent = node.get_parent()
+        if parent is None:
+            profile = self.profiles.get(node.node_id())
+            return profile.decision_calls if profile else 0
+        profile = self.profiles.get(parent.node_id())
+        if profile is None:
+            return 0
+        for index,child in enumerate(parent.children()):
+            if child is node:
+                return profile.branches[index]
+        return 0
+
+
+    def annotation(self,node:BaseNode)->str:
+        """Visit share of every node and terminal, with the call counts and
+        mean times of nodes, for stringify_tree."""
+        root = self.profiles.get(self.root.node_id())
+        decisions = root.decision_calls if root else 0
+        share = self.visits(node) / decisions if decisions else 0.0
+        text = F"(visited {share:.1%}"
+
+        profile = self.profiles.get(node.node_id())
+        if profile is not None:
+            evaluate = profile.evaluate_ns / max(profile.evaluate_calls,1)
+            decide = profile.decision_ns / max(profile.decision_calls,1)
+            text += (F", evaluate {profile.evaluate_calls}x "
+                     F"{evaluate/1e3:.1f}us, decide "
+                     F"{profile.decision_calls}x {decide/1e3:.1f}us")
+        return text + ")"
+
+
+    def report(self)->str:
+        """The tree from stringify_tree with every node annotated inline."""
+        return stringify_tree(self.root,annotate=self.annotation)
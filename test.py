@@ -4,11 +4,12 @@ import numpy as np
 import pandas as pd
 import json
 
-from Candle import new_candle
-from DataBuffer import DataBuffer
+from Candle import new_candle,CandleStore
 from Indicators.Indicators import ChaikinOscillator,MovingAverageConverganceDivergence
 from TreeActions import pprint_tree,make_tree_decision,evaluate_next_value
 from TreeIO import deserialize_tree
+from TickerData import load_ticker,ticker_rows
+from Decision import Decision
 
 candle_period = 30
 prev_volume = 0.0
@@ -53,35 +54,138 @@ def main():
 	with open("./SerializedTrees/popfile-0.json") as file:
 		tree = deserialize_tree(file.read())
 
-	training_data = pd.read_csv("BTCUSDT_ticker.csv")
-	training_data = training_data[["best_bid","best_ask","total_traded_usdt"]]
-	training_data = training_data.to_dict("records")
+	training_data = load_ticker("BTCUSDT_ticker.csv",
+		columns=["best_bid","best_ask","total_traded_usdt"])
 
 	current_candle = new_candle()
 
-	candles = DataBuffer(max_size=500,
-						 filename="candles.csv",
-						 header=["open","high","low","close","volume","elements"])
+	candles = CandleStore(max_size=500,filename="candles.csv")
 
 	ramp_up_candles = 100
 	# ramp_up_candles = 217
 	decisions = []
-	for data in training_data:
+	for data in ticker_rows(training_data):
 		if update_current_candle(current_candle,data):
 			candles.push(current_candle)
 
-			evaluate_next_value(tree,candles.get_all())
+			evaluate_next_value(tree,candles)
 			if candles.current_size() > ramp_up_candles:
 				decisions.append(make_tree_decision(tree))
 			current_candle = new_candle()
 
 	print("Decisions Made: ",len(decisions))
-	print(decisions)
+	print([d.name for d in decisions])
 	print("Total: ",candles.current_size())
 
 	return decisions
 
 
+def test_backtest():
+	from Backtest import backtest_tree
+	from Candle import candles_from_ticker
+
+	with open("./SerializedTrees/popfile-0.json") as file:
+		tree = deserialize_tree(file.read(),compiled=True)
+
+	training_data = load_ticker("BTCUSDT_ticker.csv",
+		columns=["best_ask","total_traded_asset"])
+	candles = candles_from_ticker(training_data,period=candle_period)
+
+	decisions = backtest_tree(tree,candles)
+	print("Decisions Made: ",len(decisions))
+	print({d.name:int(np.sum(decisions == d)) for d in Decision})
+
+	return decisions
+
+
+def synthetic_candles(size:int,seed:int=0)->pd.DataFrame:
+	"""Random walk candles, so checks run without a recorded ticker."""
+	rng = np.random.default_rng(seed)
+	close = 30000 + np.cumsum(rng.normal(0,5,size))
+	candles = pd.DataFrame()
+	candles["open"] = np.roll(close,1)
+	candles["close"] = close
+	candles["high"] = np.maximum(candles["open"],close) + rng.uniform(0,3,size)
+	candles["low"] = np.minimum(candles["open"],close) - rng.uniform(0,3,size)
+	candles["volume"] = rng.uniform(1,100,size)
+	candles["elements"] = float(candle_period)
+	return candles
+
+
+def test_backtest_matches_live():
+	from Backtest import backtest_tree
+
+	with open("./SerializedTrees/popfile-0.json") as file:
+		serialized = file.read()
+
+	# Live indicators hold until they have seen their longest period.
+	parameters = deserialize_tree(serialized,compiled=True).parameters
+	warm_up = max(v for p in parameters for k,v in p.items()
+		if k.endswith("period"))
+
+	for seed in range(3):
+		candles = synthetic_candles(300,seed)
+		batch = backtest_tree(serialized,candles)
+
+		for compiled in (False,True):
+			tree = deserialize_tree(serialized,compiled=compiled)
+			store = CandleStore(max_size=len(candles))
+			live = []
+			for candle in candles.to_dict("records"):
+				store.push(candle)
+				evaluate_next_value(tree,store)
+				live.append(make_tree_decision(tree))
+
+			live = np.array(live,dtype=batch.dtype)
+			differing = np.flatnonzero(live[warm_up:] != batch[warm_up:])
+			assert differing.shape[0] == 0,\
+				F"Seed {seed} differs after warm up at {differing+warm_up}"
+
+	print("Backtest decisions equal the live tree's")
+	return batch
+
+
+def test_sweep():
+	from Sweep import sweep_node
+	from Candle import candles_from_ticker
+
+	with open("./SerializedTrees/popfile-0.json") as file:
+		tree = file.read()
+
+	training_data = load_ticker("BTCUSDT_ticker.csv",
+		columns=["best_ask","total_traded_asset"])
+	candles = candles_from_ticker(training_data,period=candle_period)
+
+	results = sweep_node(tree,0,candles,steps=6)
+	print(results.sort_values("final_balance",ascending=False).head())
+
+	return results
+
+
+def test_profile():
+	from TreeProfiler import TreeProfiler
+
+	with open("./SerializedTrees/popfile-0.json") as file:
+		tree = deserialize_tree(file.read())
+
+	candles = CandleStore(max_size=2*candle_period)
+	decisions = []
+	with TreeProfiler(tree) as profiler:
+		for candle in synthetic_candles(300).to_dict("records"):
+			candles.push(candle)
+			evaluate_next_value(tree,candles)
+			decisions.append(make_tree_decision(tree))
+
+	stats = profiler.stats()
+	assert stats[tree.node_id()]["decision_calls"] == len(decisions)
+	for node in stats.values():
+		assert node["evaluate_calls"] == len(decisions)
+		assert sum(node["branches"].values()) == node["decision_calls"]
+	print(profiler.report())
+
+	return stats
+
+
 def test_deserialization():
 	from TreeIO import deserialize_tree
 